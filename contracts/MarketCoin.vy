@@ -25,6 +25,12 @@ decimals: public(uint8)  # 18
 totalSupply: public(uint256)  # Total supply of coin that has been minted
 owner: public(address)  # Marketplace
 
+# EIP-2612 permit, see https://eips.ethereum.org/EIPS/eip-2612
+DOMAIN_TYPE_HASH: constant(bytes32) = keccak256("EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)")
+PERMIT_TYPE_HASH: constant(bytes32) = keccak256("Permit(address owner,address spender,uint256 value,uint256 nonce,uint256 deadline)")
+DOMAIN_SEPARATOR: public(bytes32)  # EIP-712 domain separator, "MarketCoin" version "1"
+nonces: public(HashMap[address, uint256])  # next permit nonce of an owner
+
 
 @external
 def __init__(_owner: address):
@@ -32,6 +38,15 @@ def __init__(_owner: address):
     self.symbol = "MC"
     self.decimals = 18
     self.owner = _owner
+    self.DOMAIN_SEPARATOR = keccak256(
+        concat(
+            DOMAIN_TYPE_HASH,
+            keccak256(convert("MarketCoin", Bytes[10])),
+            keccak256(convert("1", Bytes[1])),
+            convert(chain.id, bytes32),
+            convert(self, bytes32)
+        )
+    )
 
 
 # @notice Change the owner of the contract
@@ -85,6 +100,44 @@ def approve(_spender: address, _value: uint256) -> bool:
     return True
 
 
+# @notice Approve with a signature of _owner instead of a transaction from _owner
+# @dev Emit a Approval Event
+# @dev The signature is the EIP-712 signature of a Permit message, with the
+# current nonce of _owner
+# @param _owner The address giving the allowance
+# @param _spender The address that can then withdraw from _owner account
+# @param _value The maximum amount of token that can then be transfer
+# @param _deadline The timestamp after which the signature is not valid anymore
+# @param _v, _r, _s The signature of _owner
+# @return True if transaction successful.
+@external
+def permit(_owner: address, _spender: address, _value: uint256, _deadline: uint256, _v: uint8, _r: bytes32, _s: bytes32) -> bool:
+    assert _owner != ZERO_ADDRESS, "MarketCoin: Invalid owner"
+    assert block.timestamp <= _deadline, "MarketCoin: Permit expired"
+    nonce: uint256 = self.nonces[_owner]
+    digest: bytes32 = keccak256(
+        concat(
+            b"\x19\x01",
+            self.DOMAIN_SEPARATOR,
+            keccak256(
+                concat(
+                    PERMIT_TYPE_HASH,
+                    convert(_owner, bytes32),
+                    convert(_spender, bytes32),
+                    convert(_value, bytes32),
+                    convert(nonce, bytes32),
+                    convert(_deadline, bytes32)
+                )
+            )
+        )
+    )
+    assert ecrecover(digest, convert(_v, uint256), convert(_r, uint256), convert(_s, uint256)) == _owner, "MarketCoin: Invalid signature"
+    self.nonces[_owner] = nonce + 1
+    self.allowance[_owner][_spender] = _value
+    log Approval(_owner, _spender, _value)
+    return True
+
+
 # @notice Mint _amount of token to _to
 # @dev Emit a Transfer Event
 # @dev onlyOwner
@@ -110,4 +163,17 @@ def mint(_to: address, _amount: uint256):
 def burn(_amount: uint256):
     self.balanceOf[msg.sender] -= _amount
     self.totalSupply -= _amount
-    log Transfer(msg.sender, ZERO_ADDRESS, _amount)
\ No newline at end of file
+    log Transfer(msg.sender, ZERO_ADDRESS, _amount)
+
+
+# @notice Burn _amount of token of _from without allowance
+# @dev Emit a Transfer Event
+# @dev onlyOwner, so the marketplace can charge MarketCoin in a single call
+# @param _from The address whose token should be burned
+# @param _amount The amount of token to be burned
+@external
+def burnFrom(_from: address, _amount: uint256):
+    assert msg.sender == self.owner, "MarketCoin: Only owner can burn token of others"
+    self.balanceOf[_from] -= _amount
+    self.totalSupply -= _amount
+    log Transfer(_from, ZERO_ADDRESS, _amount)
\ No newline at end of file
@@ -35,12 +35,23 @@ totalSupply: public(uint256)  # Total number of NFT
 nextTokenId: public(uint256)  # Id of the next token which will be minted
 
 ownerToCount: public(HashMap[address, uint256])  # mapping owner -> # of NFT in this collection
-idToOwner: public(HashMap[uint256, address])  # mapping tokenId -> owner
 idToApproved: public(HashMap[uint256, address])  # mapping tokenId -> address approved 
 ownerToApprovedForAll: public(HashMap[address, HashMap[address, bool]])  # mapping owner -> operator -> bool
+# mapping tokenId -> owner (160 bits) | index in allTokens + 1 (48 bits) | index in ownedTokens (48 bits)
+tokenData: HashMap[uint256, uint256]
+allTokens: HashMap[uint256, uint256]  # mapping index -> tokenId + 1, see tokenByIndex
+ownedTokens: HashMap[address, HashMap[uint256, uint256]]  # mapping owner -> index -> tokenId + 1, see tokenOfOwnerByIndex
 
 mintPrice: public(uint256)  # Mint price for an NFT
 
+# A run of tokens minted at once only has its first token written in tokenData,
+# allTokens and ownedTokens: the other ones are resolved from the closest
+# written entry before them. Before a token of a run is written, the next one
+# is written so that the run is split instead of broken.
+MAX_MINT_BATCH: constant(uint256) = 20  # max number of NFT minted at once, bounds the length of a run
+RUN_STEP: constant(uint256) = 2**160 + 2**208  # tokenData of the next token of a run, both indexes grow by one
+BURNED: constant(uint256) = 2**255  # tokenData of a burned token, no owner but stops the resolution
+
 supportedInterface: public(HashMap[bytes32, bool])  # mapping interface -> bool
 
 #TODO add tokenURI to fully implements ERC721Metadata interface, ERC-165 identifier for this interface is 0x5b5e139f.
@@ -52,6 +63,47 @@ def __init__(_owner: address, _mintPrice: uint256):
     self.owner = _owner
     self.mintPrice = _mintPrice
     self.supportedInterface[0x0000000000000000000000000000000000000000000000000000000080ac58cd] = True
+    self.supportedInterface[0x00000000000000000000000000000000000000000000000000000000780e9d63] = True
+
+
+# @dev Resolve the tokenData of a token, 0 if it doesn't exist. A transfer or a
+# burn resolves it once and passes it down.
+@view
+@internal
+def _tokenData(_tokenId: uint256) -> uint256:
+    if _tokenId >= self.nextTokenId:
+        return 0
+    for i in range(MAX_MINT_BATCH):
+        data: uint256 = self.tokenData[_tokenId - i]
+        if data != 0:
+            return data + i * RUN_STEP
+    return 0
+
+
+@view
+@internal
+def _ownerOf(_tokenId: uint256) -> address:
+    return convert(bitwise_and(self._tokenData(_tokenId), 2**160 - 1), address)
+
+
+@view
+@internal
+def _tokenAt(_index: uint256) -> uint256:
+    for i in range(MAX_MINT_BATCH):
+        tokenId: uint256 = self.allTokens[_index - i]
+        if tokenId != 0:
+            return tokenId - 1 + i
+    return 0
+
+
+@view
+@internal
+def _ownedTokenAt(_owner: address, _index: uint256) -> uint256:
+    for i in range(MAX_MINT_BATCH):
+        tokenId: uint256 = self.ownedTokens[_owner][_index - i]
+        if tokenId != 0:
+            return tokenId - 1 + i
+    return 0
 
 
 # @notice Count all NFTs assigned to an owner
@@ -74,11 +126,20 @@ def balanceOf(_owner: address) -> uint256:
 @view
 @external
 def ownerOf(_tokenId: uint256) -> address:
-    owner: address = self.idToOwner[_tokenId]
+    owner: address = self._ownerOf(_tokenId)
     assert owner != ZERO_ADDRESS, "MarketNFT: Token doesn't exist"
     return owner
 
 
+# @notice Find the owner of an NFT without reverting
+# @param _tokenId The identifier for an NFT
+# @return The owner of the NFT, ZERO_ADDRESS if it doesn't exist or is burned
+@view
+@external
+def idToOwner(_tokenId: uint256) -> address:
+    return self._ownerOf(_tokenId)
+
+
 # @notice Get the approved address for a single NFT
 # @dev Throws if `_tokenId` is not a valid NFT.
 # @param _tokenId The NFT to find the approved address for
@@ -99,40 +160,81 @@ def isApprovedForAll(_owner: address, _operator: address) -> bool:
     return self.ownerToApprovedForAll[_owner][_operator]
 
 
-@internal
-def _addToken(_to: address, _tokenId: uint256):
-    assert _to != ZERO_ADDRESS, "MarketNFT: Can't transfer to null address"
-    self.idToOwner[_tokenId] = _to
-    self.ownerToCount[_to] += 1
-    self.totalSupply += 1
+# @notice Enumerate valid NFTs
+# @dev Throws if `_index` >= `totalSupply()`.
+# @param _index A counter less than `totalSupply()`
+# @return The token identifier for the `_index`th NFT
+@view
+@external
+def tokenByIndex(_index: uint256) -> uint256:
+    assert _index < self.totalSupply, "MarketNFT: Index out of range"
+    return self._tokenAt(_index)
+
+
+# @notice Enumerate NFTs assigned to an owner
+# @dev Throws if `_index` >= `balanceOf(_owner)` or if `_owner` is the zero address
+# @param _owner An address where we are interested in NFTs owned by them
+# @param _index A counter less than `balanceOf(_owner)`
+# @return The token identifier for the `_index`th NFT assigned to `_owner`
+@view
+@external
+def tokenOfOwnerByIndex(_owner: address, _index: uint256) -> uint256:
+    assert _owner != ZERO_ADDRESS, "MarketNFT: ZERO_ADDRESS cannot own NFTs"
+    assert _index < self.ownerToCount[_owner], "MarketNFT: Index out of range"
+    return self._ownedTokenAt(_owner, _index)
 
 
+# @dev _previous is the resolved tokenData of the token before the write
 @internal
-def _removeToken(_from: address, _tokenId: uint256):
-    assert _from == self.idToOwner[_tokenId], "MarketNFT: Not owner of the token"
-    self.idToOwner[_tokenId] = ZERO_ADDRESS
-    self.idToApproved[_tokenId] = ZERO_ADDRESS
-    self.ownerToCount[_from] -= 1
-    self.totalSupply -= 1
+def _setTokenData(_tokenId: uint256, _previous: uint256, _data: uint256):
+    next: uint256 = _tokenId + 1
+    if next < self.nextTokenId and self.tokenData[next] == 0:
+        self.tokenData[next] = _previous + RUN_STEP
+    self.tokenData[_tokenId] = _data
 
 
+# @dev _data is the resolved tokenData of _tokenId
 @internal
-def _transfer(_from: address, _to: address, _tokenId: uint256):
-    assert _to != ZERO_ADDRESS, "MarketNFT: Can't transfer to null address"
-    # assert _tokenId < self.totalSupply, "MarketNFT: Token doesn't exist" # should never fails since we always check ownership/approval first
-    self._removeToken(_from, _tokenId)
-    self._addToken(_to, _tokenId)
-    log Transfer(_from, _to, _tokenId)
+def _removeFromOwnedTokens(_from: address, _tokenId: uint256, _data: uint256):
+    # swap with the last token of _from and pop
+    index: uint256 = shift(_data, -208)
+    lastIndex: uint256 = self.ownerToCount[_from] - 1
+    self.ownerToCount[_from] = lastIndex
+    if index != lastIndex:
+        lastTokenId: uint256 = self._ownedTokenAt(_from, lastIndex)
+        if index + 1 < lastIndex and self.ownedTokens[_from][index + 1] == 0:
+            self.ownedTokens[_from][index + 1] = _tokenId + 2
+        self.ownedTokens[_from][index] = lastTokenId + 1
+        lastData: uint256 = self._tokenData(lastTokenId)
+        self._setTokenData(lastTokenId, lastData, bitwise_or(bitwise_and(lastData, 2**208 - 1), shift(index, 208)))
+    self.ownedTokens[_from][lastIndex] = 0
 
 
+@view
 @internal
-def _isOwnerOrApproved(_address: address, _tokenId: uint256) -> bool:
+def _isOwnerOrApproved(_address: address, _owner: address, _tokenId: uint256) -> bool:
+    return _address == _owner or _address == self.idToApproved[_tokenId] or self.ownerToApprovedForAll[_owner][_address]
 
-    owner: address = self.idToOwner[_tokenId]
-    approved: address = self.idToApproved[_tokenId]
-    isApprovedForAll: bool = self.ownerToApprovedForAll[owner][_address]
 
-    return (_address == owner or _address == approved or isApprovedForAll) 
+# @dev The tokenData is resolved once, owner, approval and counts are written
+# once and totalSupply is left alone
+@internal
+def _transfer(_sender: address, _from: address, _to: address, _tokenId: uint256):
+    data: uint256 = self._tokenData(_tokenId)
+    owner: address = convert(bitwise_and(data, 2**160 - 1), address)
+    #the sender must be the owner or approved
+    assert self._isOwnerOrApproved(_sender, owner, _tokenId), "MarketNFT: Caller not approved"
+    assert _to != ZERO_ADDRESS, "MarketNFT: Can't transfer to null address"
+    assert _from == owner, "MarketNFT: Not owner of the token"
+    self.idToApproved[_tokenId] = ZERO_ADDRESS
+    self._removeFromOwnedTokens(_from, _tokenId, data)
+
+    # add at the end of the tokens of _to
+    index: uint256 = self.ownerToCount[_to]
+    self.ownedTokens[_to][index] = _tokenId + 1
+    self.ownerToCount[_to] = index + 1
+    self._setTokenData(_tokenId, data, bitwise_or(bitwise_or(convert(_to, uint256), bitwise_and(data, 2**208 - 2**160)), shift(index, 208)))
+    log Transfer(_from, _to, _tokenId)
 
 
 # @notice Transfers _tokenId from address _from to address _to
@@ -153,11 +255,7 @@ def _isOwnerOrApproved(_address: address, _tokenId: uint256) -> bool:
 # @param _tokenId The NFT to transfer
 @external
 def transferFrom(_from: address, _to: address, _tokenId: uint256):
-    
-    #the sender must be the owner or approved
-    assert self._isOwnerOrApproved(msg.sender, _tokenId), "MarketNFT: Caller not approved"
-    
-    self._transfer(_from, _to, _tokenId)
+    self._transfer(msg.sender, _from, _to, _tokenId)
 
 # @notice Transfers the ownership of an NFT from one address to another address
 # @dev Throws unless `msg.sender` is the current owner, an authorized
@@ -173,11 +271,7 @@ def transferFrom(_from: address, _to: address, _tokenId: uint256):
 # @param data Additional data with no specified format, sent in call to `_to`
 @external
 def safeTransferFrom(_from: address, _to: address, _tokenId: uint256, _data: Bytes[1024]=b''):
-    
-    #the sender must be the owner or approved
-    assert self._isOwnerOrApproved(msg.sender, _tokenId), "MarketNFT: Caller not approved"
-
-    self._transfer(_from, _to, _tokenId)
+    self._transfer(msg.sender, _from, _to, _tokenId)
 
     if _to.is_contract:
         assert ERC721Receiver(_to).onERC721Received(msg.sender, _from, _tokenId, _data) == keccak256("onERC721Received(address,address,uint256,bytes)")
@@ -191,7 +285,7 @@ def safeTransferFrom(_from: address, _to: address, _tokenId: uint256, _data: Byt
 # @param _tokenId The NFT to approve
 @external
 def approve(_approved: address, _tokenId: uint256):
-    assert self._isOwnerOrApproved(msg.sender, _tokenId), "MarketNFT: Caller not approved"
+    assert self._isOwnerOrApproved(msg.sender, self._ownerOf(_tokenId), _tokenId), "MarketNFT: Caller not approved"
     self.idToApproved[_tokenId] = _approved
     log Approval(msg.sender, _approved, _tokenId)
 
@@ -229,18 +323,46 @@ def setMintPrice(_newPrice: uint256):
     assert msg.sender == self.owner, "MarketNFT: Only owner can do that"
     self.mintPrice = _newPrice
 
+@internal
+def _mint(_to: address, _quantity: uint256):
+    assert _to != ZERO_ADDRESS, "MarketNFT: Can't transfer to null address"
+    assert _quantity > 0 and _quantity <= MAX_MINT_BATCH, "MarketNFT: Invalid quantity"
+    tokenId: uint256 = self.nextTokenId
+    index: uint256 = self.totalSupply
+    ownedIndex: uint256 = self.ownerToCount[_to]
+    # only the first token of the run is written, at the end of allTokens and
+    # of the tokens of _to
+    self.tokenData[tokenId] = bitwise_or(bitwise_or(convert(_to, uint256), shift(index + 1, 160)), shift(ownedIndex, 208))
+    self.allTokens[index] = tokenId + 1
+    self.ownedTokens[_to][ownedIndex] = tokenId + 1
+    self.ownerToCount[_to] = ownedIndex + _quantity
+    self.totalSupply = index + _quantity
+    self.nextTokenId = tokenId + _quantity
+    for i in range(MAX_MINT_BATCH):
+        if i >= _quantity:
+            break
+        log Transfer(ZERO_ADDRESS, _to, tokenId + i)
+
+
 # @notice Mint an NFT
 # @param _to The address that will receive the NFT
 # @dev An NFT can only be mint by the owner, e.g. a marketplace.
 @external
 def mint(_to: address):
     assert msg.sender == self.owner, "MarketNFT: Only owner of MarketNFT can mint"
-    newTokenId: uint256 = self.nextTokenId
-    self._addToken(_to, newTokenId)
-    self.nextTokenId += 1
-    log Transfer(ZERO_ADDRESS, _to, newTokenId)
+    self._mint(_to, 1)
 
 
+# @notice Mint several NFTs with consecutive ids
+# @param _to The address that will receive the NFTs
+# @param _quantity The number of NFTs to mint, at most MAX_MINT_BATCH
+# @dev The storage is written once for the whole run, so the cost barely
+# depends on _quantity apart from the Transfer events.
+@external
+def mintBatch(_to: address, _quantity: uint256):
+    assert msg.sender == self.owner, "MarketNFT: Only owner of MarketNFT can mint"
+    self._mint(_to, _quantity)
+
 
 # @notice Burn an NFT
 # @param _tokenId The id of the token to burn
@@ -248,8 +370,22 @@ def mint(_to: address):
 @external
 def burn(_tokenId: uint256):
     assert msg.sender == self.owner, "MarketNFT: Only owner of MarketNFT can burn"
-    previousOwner: address = self.idToOwner[_tokenId]
-    self._removeToken(self.idToOwner[_tokenId], _tokenId)
+    data: uint256 = self._tokenData(_tokenId)
+    previousOwner: address = convert(bitwise_and(data, 2**160 - 1), address)
+    assert previousOwner != ZERO_ADDRESS, "MarketNFT: Token doesn't exist"
+    self.idToApproved[_tokenId] = ZERO_ADDRESS
+    self._removeFromOwnedTokens(previousOwner, _tokenId, data)
+    # swap with the last token of allTokens and pop
+    index: uint256 = bitwise_and(shift(data, -160), 2**48 - 1) - 1
+    lastIndex: uint256 = self.totalSupply - 1
+    self.totalSupply = lastIndex
+    if index != lastIndex:
+        lastTokenId: uint256 = self._tokenAt(lastIndex)
+        if index + 1 < lastIndex and self.allTokens[index + 1] == 0:
+            self.allTokens[index + 1] = _tokenId + 2
+        self.allTokens[index] = lastTokenId + 1
+        lastData: uint256 = self._tokenData(lastTokenId)
+        self._setTokenData(lastTokenId, lastData, bitwise_or(bitwise_and(lastData, bitwise_not(2**208 - 2**160)), shift(index + 1, 160)))
+    self.allTokens[lastIndex] = 0
+    self._setTokenData(_tokenId, data, BURNED)
     log Transfer(previousOwner, ZERO_ADDRESS, _tokenId)
-
-
@@ -0,0 +1,71 @@
+# Multi Token
+# https://eips.ethereum.org/EIPS/eip-1155
+# @version 0.3.1
+
+interface ERC1155Receiver:
+    def onERC1155Received(
+            _operator: address,
+            _from: address,
+            _id: uint256,
+            _value: uint256,
+            _data: Bytes[1024]
+        ) -> bytes32: nonpayable
+
+event TransferSingle:
+    _operator: indexed(address)
+    _from: indexed(address)
+    _to: indexed(address)
+    _id: uint256
+    _value: uint256
+
+event ApprovalForAll:
+    _owner: indexed(address)
+    _operator: indexed(address)
+    _approved: bool
+
+
+# bytes4(keccak256("onERC1155Received(address,address,uint256,uint256,bytes)")), left aligned
+ERC1155_RECEIVED: constant(bytes32) = 0xf23a6e6100000000000000000000000000000000000000000000000000000000
+
+owner: public(address)
+balanceOf: public(HashMap[address, HashMap[uint256, uint256]])  # mapping owner -> id -> balance
+isApprovedForAll: public(HashMap[address, HashMap[address, bool]])  # mapping owner -> operator -> bool
+supportedInterface: public(HashMap[bytes32, bool])  # mapping interface -> bool
+
+
+@external
+def __init__():
+    self.owner = msg.sender
+    self.supportedInterface[0x0000000000000000000000000000000000000000000000000000000001ffc9a7] = True
+    self.supportedInterface[0x00000000000000000000000000000000000000000000000000000000d9b67a26] = True
+
+
+@view
+@external
+def supportsInterface(_interfaceID: bytes32) -> bool:
+    return self.supportedInterface[_interfaceID]
+
+
+@external
+def setApprovalForAll(_operator: address, _approved: bool):
+    self.isApprovedForAll[msg.sender][_operator] = _approved
+    log ApprovalForAll(msg.sender, _operator, _approved)
+
+
+@external
+def safeTransferFrom(_from: address, _to: address, _id: uint256, _value: uint256, _data: Bytes[1024]):
+    assert _to != ZERO_ADDRESS, "Can't transfer to null address"
+    assert msg.sender == _from or self.isApprovedForAll[_from][msg.sender], "Caller not approved"
+    self.balanceOf[_from][_id] -= _value
+    self.balanceOf[_to][_id] += _value
+    log TransferSingle(msg.sender, _from, _to, _id, _value)
+
+    if _to.is_contract:
+        assert ERC1155Receiver(_to).onERC1155Received(msg.sender, _from, _id, _value, _data) == ERC1155_RECEIVED
+
+
+# anybody can mint, this token is used to test the marketplace
+@external
+def mint(_id: uint256, _value: uint256):
+    self.balanceOf[msg.sender][_id] += _value
+    log TransferSingle(msg.sender, ZERO_ADDRESS, msg.sender, _id, _value)
@@ -15,7 +15,7 @@ interface NFToken:
     def balanceOf(_owner: address) -> uint256: view
     def ownerOf(_tokenId: uint256) -> address: view
     def getApproved(_tokenId: uint256) -> address: view
-    def isApprovedForAll(_owner: address, _operator: address) -> bool: nonpayable
+    def isApprovedForAll(_owner: address, _operator: address) -> bool: view
     def transferFrom(_from: address, _to: address, _tokenId: uint256): nonpayable
     def safeTransferFrom(_from: address, _to: address, _tokenId: uint256, _data: Bytes[1024]): nonpayable
     def approve(_approved: address, _tokenId: uint256): nonpayable
@@ -33,6 +33,7 @@ interface MarketCoin:
     def approve(_spender: address, _value: uint256) -> bool: nonpayable
     def mint(_to: address, _amount: uint256): nonpayable
     def burn(_amount: uint256) -> bool: nonpayable
+    def burnFrom(_from: address, _amount: uint256): nonpayable
 
 
 # interface for the MarketNFT NFT
@@ -55,22 +56,43 @@ interface MarketNFT:
     def setApprovalForAll(_operator: address, _approved: bool): nonpayable
     def setMintPrice(_newPrice: uint256): nonpayable
     def mint(_to: address): nonpayable
+    def mintBatch(_to: address, _quantity: uint256): nonpayable
 
-event Posting:
-    _seller: address
-    _price: uint256
-    _nft: address
+# the listing events only log what changed, the id, seller and nft are topics
+# so the logs can be filtered by the node
+event Listed:
+    _id: indexed(uint256)
+    _seller: indexed(address)
+    _nft: indexed(address)
     _tokenId: uint256
+    _price: uint256
+
+event Repriced:
+    _id: indexed(uint256)
+    _price: uint256
+
+event Cancelled:
+    _id: indexed(uint256)
 
-event ListingUpdated:
-    _id: uint256
-    _listing: Listing
+# one event for a whole cancelSellBatch, the ids are packed 32 bytes each
+event ListingsCancelled:
+    _seller: indexed(address)
+    _ids: Bytes[1600]
 
+# one event for a whole updateSellBatch, the ids and new prices are packed 32 bytes each
+event ListingsRepriced:
+    _seller: indexed(address)
+    _ids: Bytes[1600]
+    _prices: Bytes[1600]
+
+# closes a listing like Cancelled, _id is NO_LISTING for a token sold without
+# listing (signed order, collection offer)
 event Sale:
-    _seller: address
+    _id: indexed(uint256)
+    _seller: indexed(address)
     _buyer: address
     _price: uint256
-    _nft: address
+    _nft: indexed(address)
     _tokenId: uint256
 
 event BidEvent:
@@ -78,9 +100,43 @@ event BidEvent:
     _bidder: address
     _bid: uint256
 
+event BundleUpdated:
+    _bundleId: uint256
+    _seller: address
+    _price: uint256
+    _status: uint8
+
+event BundleSale:
+    _bundleId: uint256
+    _seller: address
+    _buyer: address
+    _price: uint256
+
+event OfferUpdated:
+    _offerId: uint256
+    _buyer: address
+    _nft: address
+    _price: uint256
+    _quantity: uint256
+
 struct Bid:
     _bidder: address
     _bid: uint256
+
+# Tokens sold together for a single price, the tokens are in bundleNfts/bundleTokenIds
+struct Bundle:
+    _seller: address
+    _price: uint256
+    _size: uint256
+    _status: uint8 # 0-DOESNT EXIST, 1-OPEN, 2-SOLD, 3-CANCELED
+
+# Offer of a buyer for any _quantity tokens of the collection _nft at _price each,
+# the ether is escrowed in the marketplace
+struct Offer:
+    _buyer: address
+    _nft: address
+    _price: uint256
+    _quantity: uint256  # number of tokens left to buy, 0 once filled or cancelled
     
 struct Listing:
     _seller: address
@@ -89,113 +145,607 @@ struct Listing:
     _price: uint256
     _status: uint8 # 0-DOESNT EXIST, 1-OPEN, 2-SOLD, 3-CANCELED
 
+# Storage layout of a Listing, 2 slots instead of 5:
+# the price can be updated and the status changed by writing a single slot
+struct PackedListing:
+    _sellerPrice: uint256  # seller (160 bits) | price (96 bits)
+    _nftStatusTokenId: uint256  # nft (160 bits) | status (8 bits) | tokenId (88 bits)
+
+
+MAX_BATCH: constant(uint256) = 50  # max number of items handled by the batch functions
+MAX_BUNDLE_SIZE: constant(uint256) = 20  # max number of tokens in a bundle
+NO_LISTING: constant(uint256) = MAX_UINT256  # id logged in Sale for a token sold without listing
+# Prices and tokenIds that don't fit in their packed field are stored as the max
+# value of the field and their full value is kept in idToFullPrice/idToFullTokenId
+MAX_PACKED_PRICE: constant(uint256) = 2**96 - 1
+MAX_PACKED_TOKEN_ID: constant(uint256) = 2**88 - 1
+# Flags of the config
+ACCRUE_REWARDS: constant(uint256) = 2**168
+ARCHIVE_LISTINGS: constant(uint256) = 2**169
+ESCROW_PROCEEDS: constant(uint256) = 2**170
+
+# EIP-712 signed orders, see fulfillOrder
+DOMAIN_TYPE_HASH: constant(bytes32) = keccak256("EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)")
+ORDER_TYPE_HASH: constant(bytes32) = keccak256("Order(address seller,address nft,uint256 tokenId,uint256 price,uint256 expiry,uint256 nonce)")
 
 currentId: public(uint256)
-idToListing: public(HashMap[uint256, Listing])
+listings: HashMap[uint256, PackedListing]
+idToFullPrice: HashMap[uint256, uint256]  # listing Id -> price, if >= MAX_PACKED_PRICE
+idToFullTokenId: HashMap[uint256, uint256]  # listing Id -> tokenId, if >= MAX_PACKED_TOKEN_ID
+openListingCount: public(uint256)  # number of OPEN listings
+openListings: HashMap[uint256, uint256]  # index -> id of an OPEN listing, see openListingAt
+# id of an OPEN listing -> index in openListings (128 bits) | index in nftOpenListings (128 bits)
+openListingIndex: HashMap[uint256, uint256]
+nftOpenListingCount: public(HashMap[address, uint256])  # nft -> number of OPEN listings
+nftOpenListings: public(HashMap[address, HashMap[uint256, uint256]])  # nft -> index -> id of an OPEN listing
+tokenToListing: HashMap[address, HashMap[uint256, uint256]]  # nft -> tokenId -> id + 1 of the OPEN listing, 0 if none
+sellerListingCount: public(HashMap[address, uint256])  # seller -> number of listings
+sellerListings: public(HashMap[address, HashMap[uint256, uint256]])  # seller -> index -> id of a listing
 idToBid: public(HashMap[uint256, HashMap[uint256, Bid]])  # listing Id -> bid # -> Bid
 listingToBidNumber: public(HashMap[uint256, uint256])  # listing Id -> highest current Bid Id in self.idToBid
+bidRefunds: public(HashMap[address, uint256])  # outbid amount that can be withdrawn by a bidder
+bundleCount: public(uint256)  # number of bundles, id of the next one
+bundles: public(HashMap[uint256, Bundle])  # bundle Id -> Bundle
+bundleNfts: public(HashMap[uint256, HashMap[uint256, address]])  # bundle Id -> index -> nft
+bundleTokenIds: public(HashMap[uint256, HashMap[uint256, uint256]])  # bundle Id -> index -> tokenId
+offerCount: public(uint256)  # number of collection offers, id of the next one
+offers: public(HashMap[uint256, Offer])  # offer Id -> collection offer
 postingFee: public(uint256) # in wei
-sellingFee: public(uint256) # in %
 owner: public(address)
-marketplace: public(address)  # self
-marketCoin: public(address)  # Address of MarketCoin
-marketNFT: public(address)  # Address of MarketNFT
+# The config read by every sale and mint is packed so it costs a single cold
+# SLOAD, the fields have their own getter and setter:
+# marketCoin (160 bits) | sellingFee in % (8 bits) | accrueRewards (1 bit) | archiveListings (1 bit) | escrowProceeds (1 bit)
+# - marketCoin: Address of MarketCoin
+# - accrueRewards: if True MarketCoin rewards are accrued in rewards and minted with claimRewards
+# - archiveListings: if True SOLD and CANCELED listings are cleared from storage, see _setStatus
+# - escrowProceeds: if True sellers are credited in proceeds and withdraw with withdrawProceeds
+config: uint256
+mintConfig: uint256  # marketNFT, Address of MarketNFT (160 bits) | mintPrice, Price of a MarketNFT in MarketCoin (96 bits)
+rewards: public(HashMap[address, uint256])  # MarketCoin owed to an address
+proceeds: public(HashMap[address, uint256])  # ether owed to a seller, in escrowProceeds mode
+extensions: public(HashMap[address, bool])  # contracts selling for the marketplace that can reward MarketCoin, e.g. NFTMarketPlace1155
+DOMAIN_SEPARATOR: public(bytes32)  # EIP-712 domain separator, "NFTMarketPlace" version "1"
+orderNonces: public(HashMap[address, uint256])  # seller -> nonce of its valid signed orders
+filledOrders: public(HashMap[bytes32, bool])  # hash of a signed order -> already filled
+# Running aggregates of the sales, read with getStats. Each is packed in one slot
+# updated with a single addition per sale, the widths can't overflow in practice
+# (2**112 wei is 5e15 ether):
+# - stats: volume in wei (112 bits) | sale count (48 bits) | posting and selling fees earned in wei (96 bits)
+# - nftStats: volume in wei (192 bits) | sale count (64 bits), per collection, bundles under ZERO_ADDRESS
+stats: uint256
+nftStats: HashMap[address, uint256]
+feesWithdrawn: uint256  # fees withdrawn by the owner, at most the fees earned
 
 
 @external
 def __init__():
     self.owner = msg.sender
-    self.marketplace = self
     self.currentId = 0
+    self.DOMAIN_SEPARATOR = keccak256(
+        concat(
+            DOMAIN_TYPE_HASH,
+            keccak256(convert("NFTMarketPlace", Bytes[14])),
+            keccak256(convert("1", Bytes[1])),
+            convert(chain.id, bytes32),
+            convert(self, bytes32)
+        )
+    )
     
 
+@view
+@internal
+def _checkOwner(_sender: address):
+    assert _sender == self.owner, "MarketPlace: Only the owner can do that"
+
+@view
+@internal
+def _marketCoin() -> address:
+    return convert(bitwise_and(self.config, 2**160 - 1), address)
+
+@view
+@internal
+def _sellingFee() -> uint256:
+    return bitwise_and(shift(self.config, -160), 255)
+
+@internal
+def _setConfigField(_bit: int128, _mask: uint256, _value: uint256):
+    self.config = bitwise_or(bitwise_and(self.config, bitwise_not(shift(_mask, _bit))), shift(_value, _bit))
+
+@view
+@external
+def marketplace() -> address:
+    return self
+
+@view
+@external
+def marketCoin() -> address:
+    return self._marketCoin()
+
+@view
+@external
+def sellingFee() -> uint256:
+    return self._sellingFee()
+
+@view
+@external
+def accrueRewards() -> bool:
+    return bitwise_and(self.config, ACCRUE_REWARDS) != 0
+
+@view
+@external
+def archiveListings() -> bool:
+    return bitwise_and(self.config, ARCHIVE_LISTINGS) != 0
+
+@view
+@external
+def escrowProceeds() -> bool:
+    return bitwise_and(self.config, ESCROW_PROCEEDS) != 0
+
+@view
+@external
+def marketNFT() -> address:
+    return convert(bitwise_and(self.mintConfig, 2**160 - 1), address)
+
+@view
+@external
+def mintPrice() -> uint256:
+    return shift(self.mintConfig, -160)
+
 @external
 def setPostingFee(_newFee: uint256):
-    assert msg.sender == self.owner, "MarketPlace: Only the owner can do that"
+    self._checkOwner(msg.sender)
     self.postingFee = _newFee
 
 @external
 def setSellingFee(_newFee: uint256):
-    assert msg.sender == self.owner, "MarketPlace: Only the owner can do that"
-    self.sellingFee = _newFee
+    self._checkOwner(msg.sender)
+    assert _newFee <= 100, "MarketPlace: Invalid fee"
+    self._setConfigField(160, 255, _newFee)
 
 @external
 def setMarketCoin(_marketCoinAddress: address):
-    assert msg.sender == self.owner, "MarketPlace: Only the owner can do that"
-    self.marketCoin = _marketCoinAddress
+    self._checkOwner(msg.sender)
+    self._setConfigField(0, 2**160 - 1, convert(_marketCoinAddress, uint256))
 
+# @notice Set the MarketNFT minted by mintMarketNFT
+# @dev The mint price is kept, it is only set with setMintPrice
 @external
 def setMarketNFT(_marketNFTAddress: address):
-    assert msg.sender == self.owner, "MarketPlace: Only the owner can do that"
-    self.marketNFT = _marketNFTAddress
+    self._checkOwner(msg.sender)
+    self.mintConfig = bitwise_or(bitwise_and(self.mintConfig, shift(MAX_PACKED_PRICE, 160)), convert(_marketNFTAddress, uint256))
+
+@external
+def setMintPrice(_newPrice: uint256):
+    self._checkOwner(msg.sender)
+    assert _newPrice <= MAX_PACKED_PRICE, "MarketPlace: Invalid mint price"
+    self.mintConfig = bitwise_or(bitwise_and(self.mintConfig, 2**160 - 1), shift(_newPrice, 160))
+
+@external
+def setAccrueRewards(_accrue: bool):
+    self._checkOwner(msg.sender)
+    self._setConfigField(168, 1, convert(_accrue, uint256))
+
+@external
+def setArchiveListings(_archive: bool):
+    self._checkOwner(msg.sender)
+    self._setConfigField(169, 1, convert(_archive, uint256))
+
+@external
+def setEscrowProceeds(_escrow: bool):
+    self._checkOwner(msg.sender)
+    self._setConfigField(170, 1, convert(_escrow, uint256))
+
+@external
+def setExtension(_extension: address, _allowed: bool):
+    self._checkOwner(msg.sender)
+    self.extensions[_extension] = _allowed
+
+
+@pure
+@internal
+def _packSellerPrice(_seller: address, _price: uint256) -> uint256:
+    return bitwise_or(convert(_seller, uint256), shift(min(_price, MAX_PACKED_PRICE), 160))
+
+
+@pure
+@internal
+def _packNftStatusTokenId(_nft: address, _status: uint8, _tokenId: uint256) -> uint256:
+    packed: uint256 = bitwise_or(convert(_nft, uint256), shift(convert(_status, uint256), 160))
+    return bitwise_or(packed, shift(min(_tokenId, MAX_PACKED_TOKEN_ID), 168))
+
+
+@view
+@internal
+def _getListing(_id: uint256) -> Listing:
+    packed: PackedListing = self.listings[_id]
+    price: uint256 = shift(packed._sellerPrice, -160)
+    if price == MAX_PACKED_PRICE:
+        price = self.idToFullPrice[_id]
+    tokenId: uint256 = shift(packed._nftStatusTokenId, -168)
+    if tokenId == MAX_PACKED_TOKEN_ID:
+        tokenId = self.idToFullTokenId[_id]
+    return Listing({
+        _seller: convert(bitwise_and(packed._sellerPrice, 2**160 - 1), address),
+        _nft: convert(bitwise_and(packed._nftStatusTokenId, 2**160 - 1), address),
+        _tokenId: tokenId,
+        _price: price,
+        _status: convert(bitwise_and(shift(packed._nftStatusTokenId, -160), 255), uint8)
+    })
+
+
+@internal
+def _setPrice(_id: uint256, _seller: address, _price: uint256):
+    if _price >= MAX_PACKED_PRICE:
+        self.idToFullPrice[_id] = _price
+    self.listings[_id]._sellerPrice = self._packSellerPrice(_seller, _price)
+
+
+# @dev Swap the listing with the last OPEN listing and pop it, in the OPEN
+# listings of the marketplace and of the nft
+@internal
+def _removeOpenListing(_listingId: uint256, _nft: address):
+    indexes: uint256 = self.openListingIndex[_listingId]
+
+    index: uint256 = bitwise_and(indexes, 2**128 - 1)
+    lastIndex: uint256 = self.openListingCount - 1
+    if index != lastIndex:
+        lastId: uint256 = self.openListings[lastIndex]
+        self.openListings[index] = lastId
+        lastIndexes: uint256 = self.openListingIndex[lastId]
+        self.openListingIndex[lastId] = bitwise_or(index, bitwise_and(lastIndexes, shift(2**128 - 1, 128)))
+    self.openListings[lastIndex] = 0
+    self.openListingCount = lastIndex
+
+    nftIndex: uint256 = shift(indexes, -128)
+    lastNftIndex: uint256 = self.nftOpenListingCount[_nft] - 1
+    if nftIndex != lastNftIndex:
+        lastNftId: uint256 = self.nftOpenListings[_nft][lastNftIndex]
+        self.nftOpenListings[_nft][nftIndex] = lastNftId
+        lastIndexes: uint256 = self.openListingIndex[lastNftId]
+        self.openListingIndex[lastNftId] = bitwise_or(bitwise_and(lastIndexes, 2**128 - 1), shift(nftIndex, 128))
+    self.nftOpenListings[_nft][lastNftIndex] = 0
+    self.nftOpenListingCount[_nft] = lastNftIndex
+
+    self.openListingIndex[_listingId] = 0
+
+
+# @dev Only the status of a listing changes once posted (the price has its own
+# update in updateSell), so only the slot holding the status is written.
+# With archiveListings a SOLD or CANCELED listing is cleared instead, it then
+# reads as DOESNT EXIST and its history is only kept in the logs: Listed,
+# Repriced, Sale/Cancelled, and ListingsRepriced/ListingsCancelled for the batch
+# functions, where the ids are in the data and not in a topic.
+@internal
+def _setStatus(_listingId: uint256, _listing: Listing):
+    if _listing._status != 1:
+        self._removeOpenListing(_listingId, _listing._nft)
+        self.tokenToListing[_listing._nft][_listing._tokenId] = 0
+        if bitwise_and(self.config, ARCHIVE_LISTINGS) != 0:
+            self.listings[_listingId] = empty(PackedListing)
+            if _listing._price >= MAX_PACKED_PRICE:
+                self.idToFullPrice[_listingId] = 0
+            if _listing._tokenId >= MAX_PACKED_TOKEN_ID:
+                self.idToFullTokenId[_listingId] = 0
+            return
+    self.listings[_listingId]._nftStatusTokenId = self._packNftStatusTokenId(_listing._nft, _listing._status, _listing._tokenId)
+
+
+@internal
+def _cancelTokenListing(_nft: address, _tokenId: uint256):
+    previous: uint256 = self.tokenToListing[_nft][_tokenId]
+    if previous != 0:
+        previousListing: Listing = self._getListing(previous - 1)
+        previousListing._status = 3
+        self._setStatus(previous - 1, previousListing)
+        log Cancelled(previous - 1)
 
 
 @internal
 def _addListing(_seller: address, _nft: address, _tokenId: uint256, _price: uint256) -> uint256:
-    listing: Listing = Listing({_seller: _seller, _nft: _nft, _tokenId: _tokenId, _price: _price, _status: 1})
     id: uint256 = self.currentId
-    self.idToListing[id] = listing
+
+    # a token has at most one OPEN listing, the new one supersedes the previous one
+    self._cancelTokenListing(_nft, _tokenId)
+    self.tokenToListing[_nft][_tokenId] = id + 1
+
+    self._setPrice(id, _seller, _price)
+    if _tokenId >= MAX_PACKED_TOKEN_ID:
+        self.idToFullTokenId[id] = _tokenId
+    self.listings[id]._nftStatusTokenId = self._packNftStatusTokenId(_nft, 1, _tokenId)
     self.currentId += 1
-    log Posting(_seller, _price, _nft, _tokenId)
+
+    # add to the OPEN listings, of the marketplace and of the nft
+    index: uint256 = self.openListingCount
+    nftIndex: uint256 = self.nftOpenListingCount[_nft]
+    self.openListings[index] = id
+    self.nftOpenListings[_nft][nftIndex] = id
+    self.openListingIndex[id] = bitwise_or(index, shift(nftIndex, 128))
+    self.openListingCount = index + 1
+    self.nftOpenListingCount[_nft] = nftIndex + 1
+
+    # add to the listings of the seller
+    sellerIndex: uint256 = self.sellerListingCount[_seller]
+    self.sellerListings[_seller][sellerIndex] = id
+    self.sellerListingCount[_seller] = sellerIndex + 1
+    log Listed(id, _seller, _nft, _tokenId, _price)
     return id
 
 
+# @notice Get the id of an OPEN listing
+# @dev The order of the OPEN listings changes when one is removed
+# @param _index The index of the listing, lower than openListingCount
+# @return The id of the listing
+@view
+@external
+def openListingAt(_index: uint256) -> uint256:
+    assert _index < self.openListingCount, "MarketPlace: Index out of range"
+    return self.openListings[_index]
+
+
+# @notice Get the OPEN listing of a token
+# @param _nft The address of the nft
+# @param _tokenId The id of the token
+# @return The id of the listing
+@view
+@external
+def activeListingOf(_nft: address, _tokenId: uint256) -> uint256:
+    id: uint256 = self.tokenToListing[_nft][_tokenId]
+    assert id != 0, "MarketPlace: No active listing"
+    return id - 1
+
+
+# @dev ownerOf as a static call that doesn't revert, ZERO_ADDRESS if the call
+# fails, e.g. for a burned token
+@view
+@internal
+def _tokenOwner(_nft: address, _tokenId: uint256) -> address:
+    success: bool = False
+    response: Bytes[32] = b""
+    success, response = raw_call(_nft, concat(method_id("ownerOf(uint256)"), convert(_tokenId, bytes32)), max_outsize=32, is_static_call=True, revert_on_failure=False)
+    if not success or len(response) < 32:
+        return ZERO_ADDRESS
+    return extract32(response, 0, output_type=address)
+
+
+# @dev The approvals are only checked once ownerOf returned the seller, so the
+# token exists and they don't revert
+@view
 @internal
-def _updateListing(_listingId: uint256, _listing: Listing) -> uint256:
-    # listing: Listing = _listing
-    self.idToListing[_listingId] = _listing
-    log ListingUpdated(_listingId, _listing)
-    return _listingId
+def _isListingValid(_id: uint256) -> bool:
+    listing: Listing = self._getListing(_id)
+    if listing._status != 1:
+        return False
+    if self._tokenOwner(listing._nft, listing._tokenId) != listing._seller:
+        return False
+    return NFToken(listing._nft).isApprovedForAll(listing._seller, self) or NFToken(listing._nft).getApproved(listing._tokenId) == self
+
+
+# @notice Check if a listing can be bought
+# @dev The listing is OPEN, the seller still owns the token and the marketplace
+# can still transfer it. Doesn't revert when the nft does, e.g. for a burned token.
+# @param _id The id of the listing
+# @return True if the listing can be bought
+@view
+@external
+def isListingValid(_id: uint256) -> bool:
+    return self._isListingValid(_id)
+
+
+# @notice Get a listing
+# @param _id The id of the listing
+# @return The listing (seller, nft, tokenId, price, status)
+@view
+@external
+def idToListing(_id: uint256) -> Listing:
+    return self._getListing(_id)
 
 @internal
 def _mintMarketCoin(_to: address, _amount: uint256):
-    MarketCoin(self.marketCoin).mint(_to, _amount)
+    marketCoin: address = self._marketCoin()
+    MarketCoin(marketCoin).mint(_to, _amount)
+
+
+@internal
+def _rewardMarketCoin(_to: address, _amount: uint256):
+    if bitwise_and(self.config, ACCRUE_REWARDS) != 0:
+        self.rewards[_to] += _amount
+    else:
+        self._mintMarketCoin(_to, _amount)
+
+
+# @notice Reward MarketCoin for a sale made by an extension of the marketplace
+# @param _to The address to reward
+# @param _amount The amount of MarketCoin
+@external
+def rewardMarketCoin(_to: address, _amount: uint256):
+    assert self.extensions[msg.sender], "MarketPlace: Only an extension can reward"
+    self._rewardMarketCoin(_to, _amount)
+
+
+@internal
+def _checkSeller(_seller: address, _nft: address, _tokenId: uint256):
+    # check that _seller is owner or approved
+    owner: address = NFToken(_nft).ownerOf(_tokenId)
+    assert _seller == owner or _seller == NFToken(_nft).getApproved(_tokenId) or NFToken(_nft).isApprovedForAll(owner, _seller), "MarketPlace: Only the approved of the token can sell it"
+
+
+# @dev The whole amount sent is kept and counted in the fees earned, that the
+# owner can withdraw
+@internal
+def _chargePostingFee(_value: uint256, _count: uint256):
+    assert _value >= self.postingFee * _count, "MarketPlace: Amount sent is below postingFee"
+    if _value > 0:
+        self.stats += shift(_value, 160)
 
 
 @payable
 @external
 def sell(_nft: address, _tokenId: uint256, _price: uint256) -> uint256:
-    assert msg.value >= self.postingFee, "MarketPlace: Amount sent is below postingFee"
-    # check that msg.sender is owner or approved
-    owner: address = NFToken(_nft).ownerOf(_tokenId)
-    assert msg.sender == owner or msg.sender == NFToken(_nft).getApproved(_tokenId) or NFToken(_nft).isApprovedForAll(owner, msg.sender), "MarketPlace: Only the approved of the token can sell it"
+    self._chargePostingFee(msg.value, 1)
+    self._checkSeller(msg.sender, _nft, _tokenId)
 
     # Check that we are operator for the seller nft
     assert NFToken(_nft).isApprovedForAll(msg.sender, self), "MarketPlace: The marketplace doesn't have authorization to sell this token for this user"
 
     id: uint256 = self._addListing(msg.sender, _nft, _tokenId, _price)
     return id
-    
 
+
+# @notice List up to MAX_BATCH tokens in one transaction
+# @dev The postingFee is charged once for the whole batch (postingFee * _count) and
+# the operator approval is only checked when the collection changes, so group
+# the tokens by collection
+# @param _nfts The collections of the tokens, only the first _count entries are used
+# @param _tokenIds The ids of the tokens
+# @param _prices The price of each token
+# @param _count The number of tokens to list
+# @return The ids of the new listings, only the first _count entries are set
 @payable
 @external
-def cancelSell(_id: uint256) -> uint256:
-    # assert msg.value >= self.postingFee, "Amount sent is below cancellingFee"
-    listing: Listing = self.idToListing[_id]
-    assert msg.sender == listing._seller, "MarketPlace: Only the seller can cancel"
+def sellBatch(_nfts: address[MAX_BATCH], _tokenIds: uint256[MAX_BATCH], _prices: uint256[MAX_BATCH], _count: uint256) -> uint256[MAX_BATCH]:
+    assert _count <= MAX_BATCH, "MarketPlace: Batch too big"
+    self._chargePostingFee(msg.value, _count)
+
+    ids: uint256[MAX_BATCH] = empty(uint256[MAX_BATCH])
+    lastNft: address = ZERO_ADDRESS
+    for i in range(MAX_BATCH):
+        if i >= _count:
+            break
+        nft: address = _nfts[i]
+        self._checkSeller(msg.sender, nft, _tokenIds[i])
+        # Check that we are operator for the seller nft, once per collection
+        if nft != lastNft:
+            assert NFToken(nft).isApprovedForAll(msg.sender, self), "MarketPlace: The marketplace doesn't have authorization to sell this token for this user"
+            lastNft = nft
+        ids[i] = self._addListing(msg.sender, nft, _tokenIds[i], _prices[i])
+    return ids
+    
+
+@internal
+def _cancelListing(_id: uint256, _sender: address):
+    listing: Listing = self._getListing(_id)
+    assert _sender == listing._seller, "MarketPlace: Only the seller can cancel"
     assert listing._status != 2, "MarketPlace: Token already sold"
     assert listing._status == 1, "MarketPlace: Token not for sale (already cancel or doesn't exist)"
     listing._status = 3  # cancel listing
-    id: uint256 = self._updateListing(_id, listing)
-    return id
+    self._setStatus(_id, listing)
+
+
+@internal
+def _repriceListing(_id: uint256, _sender: address, _newPrice: uint256):
+    listing: Listing = self._getListing(_id)
+    assert listing._status == 1, "MarketPlace: Token not for sale (already sold, cancel or doesn't exist)"
+    assert listing._seller == _sender, "MarketPlace: Only the seller can update"
+    assert listing._price != _newPrice, "MarketPlace: The price need to be different"
+
+    self._setPrice(_id, _sender, _newPrice)
+
+
+@payable
+@external
+def cancelSell(_id: uint256) -> uint256:
+    # assert msg.value >= self.postingFee, "Amount sent is below cancellingFee"
+    self._cancelListing(_id, msg.sender)
+    log Cancelled(_id)
+    return _id
 
 @payable
 @external
 def updateSell(_id: uint256, _newPrice: uint256) -> uint256:
-    listing: Listing = self.idToListing[_id]
-    assert listing._status == 1, "MarketPlace: Token not for sale (already sold, cancel or doesn't exist)"
-    assert listing._seller == msg.sender, "MarketPlace: Only the seller can update"
-    assert listing._price != _newPrice, "MarketPlace: The price need to be different"
+    self._repriceListing(_id, msg.sender, _newPrice)
+    log Repriced(_id, _newPrice)
+    return _id
 
-    listing._price = _newPrice
-    id: uint256 = self._updateListing(_id, listing)
-    return id
+
+# @notice Cancel several listings of the sender
+# @dev The ids are packed 32 bytes each, so they are logged as is in a single
+# ListingsCancelled for the whole batch, no Cancelled is logged per listing
+# @param _ids The ids of the listings, at most MAX_BATCH
+@external
+def cancelSellBatch(_ids: Bytes[1600]):
+    for i in range(MAX_BATCH):
+        if 32 * i >= len(_ids):
+            break
+        self._cancelListing(extract32(_ids, convert(32 * i, int128), output_type=uint256), msg.sender)
+    log ListingsCancelled(msg.sender, _ids)
+
+
+# @notice Change the price of several listings of the sender
+# @dev Only the slot holding the price of each listing is written, and a single
+# ListingsRepriced is logged for the whole batch, no Repriced is logged per listing
+# @param _ids The ids of the listings, packed 32 bytes each, at most MAX_BATCH
+# @param _newPrices The new prices in wei, packed 32 bytes each
+@external
+def updateSellBatch(_ids: Bytes[1600], _newPrices: Bytes[1600]):
+    assert len(_ids) == len(_newPrices), "MarketPlace: Invalid batch"
+    for i in range(MAX_BATCH):
+        if 32 * i >= len(_ids):
+            break
+        start: int128 = convert(32 * i, int128)
+        self._repriceListing(extract32(_ids, start, output_type=uint256), msg.sender, extract32(_newPrices, start, output_type=uint256))
+    log ListingsRepriced(msg.sender, _ids, _newPrices)
+
+
+# @dev In escrowProceeds mode the seller is only credited, so the sale doesn't
+# depend on the seller's fallback and a seller pays one transfer per withdrawal
+@internal
+def _paySeller(_seller: address, _amount: uint256):
+    if bitwise_and(self.config, ESCROW_PROCEEDS) != 0:
+        self.proceeds[_seller] += _amount
+    else:
+        send(_seller, _amount)
+
+
+# @dev Add a sale to the running aggregates, a bundle is counted as one sale
+# of the collection ZERO_ADDRESS
+@internal
+def _recordSale(_nft: address, _price: uint256, _fee: uint256):
+    self.stats += _price + shift(1, 112) + shift(_fee, 160)
+    self.nftStats[_nft] += _price + shift(1, 192)
+
+
+@internal
+def _paySellerAndTransfer(_seller: address, _nft: address, _tokenId: uint256, _buyer: address, _price: uint256):
+    # Pay the seller
+    fee: uint256 = _price*self._sellingFee()/100
+    self._paySeller(_seller, _price - fee)
+    self._recordSale(_nft, _price, fee)
+
+    # Transfer the nft
+    NFToken(_nft).transferFrom(_seller, _buyer, _tokenId)
+
+    # Mint some MarketCoin token
+    self._rewardMarketCoin(_seller, _price/10)
+    self._rewardMarketCoin(_buyer, _price/10)
+
+
+# @dev Send back to the buyer the ether sent above the price, once the sale is
+# settled
+@internal
+def _refundExcess(_buyer: address, _value: uint256, _price: uint256):
+    if _value > _price:
+        send(_buyer, _value - _price)
+
+
+# @dev The listing is SOLD before the external calls, so the nft can't re-enter
+# and cancel it, which would remove it twice from the OPEN listings
+@internal
+def _settleSale(_id: uint256, _listing: Listing, _buyer: address, _price: uint256) -> uint256:
+    listing: Listing = _listing
+
+    # Update Listing
+    listing._status = 2
+    self._setStatus(_id, listing)
+    log Sale(_id, listing._seller, _buyer, _price, listing._nft, listing._tokenId)
+
+    self._paySellerAndTransfer(listing._seller, listing._nft, listing._tokenId, _buyer, _price)
+    return _id
 
 
 @payable
 @external
 def buy(_id: uint256) -> uint256:
-    listing: Listing = self.idToListing[_id]
+    listing: Listing = self._getListing(_id)
     # token is for sale
     assert listing._status != 0, "MarketPlace: Listing doesn't exist"
     assert listing._status == 1, "MarketPlace: Token no longer for sale"
@@ -204,47 +754,408 @@ def buy(_id: uint256) -> uint256:
     # enough ether is sent
     assert msg.value >= price, "MarketPlace: Not enough ether sent"
 
-    # Pay the seller
-    seller: address = listing._seller
-    fee: uint256 = price*self.sellingFee/100
-    send(seller, price - fee)
+    self._settleSale(_id, listing, msg.sender, price)
+    self._refundExcess(msg.sender, msg.value, price)
+    return _id
 
-    # Transfer the nft
-    nft: address = listing._nft
-    tokenId: uint256 = listing._tokenId
-    NFToken(nft).transferFrom(seller, msg.sender, tokenId)
 
-    # Mint some MarketCoin token
-    self._mintMarketCoin(seller, price/10)
-    self._mintMarketCoin(msg.sender, price/10)
+# @notice Buy up to MAX_BATCH listings in one transaction
+# @dev Payouts and MarketCoin rewards are grouped by seller, so every seller
+# receive one transfer and one mint, and the buyer one mint for the whole batch.
+# Any ether sent above the total price is refunded.
+# @param _ids The ids of the listings to buy, only the first _count entries are used
+# @param _count The number of listings to buy
+# @return The total price paid
+@payable
+@external
+def buyBatch(_ids: uint256[MAX_BATCH], _count: uint256) -> uint256:
+    assert _count <= MAX_BATCH, "MarketPlace: Batch too big"
 
-    # Update Listing
-    newStatus: uint8 = 2
-    listing._status = newStatus
-    id: uint256 = self._updateListing(_id, listing)
+    sellers: address[MAX_BATCH] = empty(address[MAX_BATCH])
+    payouts: uint256[MAX_BATCH] = empty(uint256[MAX_BATCH])
+    rewards: uint256[MAX_BATCH] = empty(uint256[MAX_BATCH])
+    nbSellers: uint256 = 0
+    total: uint256 = 0
+    buyerReward: uint256 = 0
+    sellingFee: uint256 = self._sellingFee()
+
+    for i in range(MAX_BATCH):
+        if i >= _count:
+            break
+        id: uint256 = _ids[i]
+        listing: Listing = self._getListing(id)
+        # token is for sale
+        assert listing._status != 0, "MarketPlace: Listing doesn't exist"
+        assert listing._status == 1, "MarketPlace: Token no longer for sale"
+
+        # Update Listing
+        listing._status = 2
+        self._setStatus(id, listing)
+        seller: address = listing._seller
+        price: uint256 = listing._price
+        log Sale(id, seller, msg.sender, price, listing._nft, listing._tokenId)
+
+        # Transfer the nft
+        NFToken(listing._nft).transferFrom(seller, msg.sender, listing._tokenId)
+
+        fee: uint256 = price*sellingFee/100
+        self._recordSale(listing._nft, price, fee)
+        total += price
+        buyerReward += price/10
+
+        # Group the payout and reward with the previous sales of this seller
+        for j in range(MAX_BATCH):
+            if j == nbSellers:
+                sellers[j] = seller
+                nbSellers += 1
+            if sellers[j] == seller:
+                payouts[j] += price - fee
+                rewards[j] += price/10
+                break
+
+    # enough ether is sent
+    assert msg.value >= total, "MarketPlace: Not enough ether sent"
+
+    # Pay the sellers
+    for j in range(MAX_BATCH):
+        if j >= nbSellers:
+            break
+        self._paySeller(sellers[j], payouts[j])
+        self._rewardMarketCoin(sellers[j], rewards[j])
+    self._rewardMarketCoin(msg.sender, buyerReward)
 
-    log Sale(seller, msg.sender, price, nft, listing._tokenId)
+    self._refundExcess(msg.sender, msg.value, total)
+    return total
+
+
+# @notice Buy a token with an order signed off-chain by its seller, nothing is
+# stored on-chain before the sale
+# @dev The order is the EIP-712 signature of an Order with the current nonce of
+# the seller, the marketplace must be operator of the seller for the nft.
+# An OPEN listing of the token is cancelled, any ether sent above _price is
+# refunded.
+# @param _seller The address that signed the order
+# @param _nft The address of the nft
+# @param _tokenId The id of the token
+# @param _price The price of the token, in wei
+# @param _expiry The timestamp after which the order can't be filled
+# @param _nonce The nonce of the seller when the order was signed
+# @param _v, _r, _s The signature of the seller
+@payable
+@external
+def fulfillOrder(_seller: address, _nft: address, _tokenId: uint256, _price: uint256, _expiry: uint256, _nonce: uint256, _v: uint8, _r: bytes32, _s: bytes32):
+    assert block.timestamp <= _expiry, "MarketPlace: Order expired"
+    assert _nonce == self.orderNonces[_seller], "MarketPlace: Order cancelled"
+    orderHash: bytes32 = keccak256(
+        concat(
+            ORDER_TYPE_HASH,
+            convert(_seller, bytes32),
+            convert(_nft, bytes32),
+            convert(_tokenId, bytes32),
+            convert(_price, bytes32),
+            convert(_expiry, bytes32),
+            convert(_nonce, bytes32)
+        )
+    )
+    assert not self.filledOrders[orderHash], "MarketPlace: Order already filled"
+    digest: bytes32 = keccak256(concat(b"\x19\x01", self.DOMAIN_SEPARATOR, orderHash))
+    assert _seller != ZERO_ADDRESS and ecrecover(digest, convert(_v, uint256), convert(_r, uint256), convert(_s, uint256)) == _seller, "MarketPlace: Invalid signature"
+    assert msg.value >= _price, "MarketPlace: Not enough ether sent"
+
+    self.filledOrders[orderHash] = True
+    self._cancelTokenListing(_nft, _tokenId)
+    self._paySellerAndTransfer(_seller, _nft, _tokenId, msg.sender, _price)
+    log Sale(NO_LISTING, _seller, msg.sender, _price, _nft, _tokenId)
+    self._refundExcess(msg.sender, msg.value, _price)
+
+
+# @notice Cancel all the orders signed by the caller so far
+# @return The new nonce to sign orders with
+@external
+def cancelOrders() -> uint256:
+    nonce: uint256 = self.orderNonces[msg.sender] + 1
+    self.orderNonces[msg.sender] = nonce
+    return nonce
+
+
+# @notice Bid on an open listing
+# @dev A bid has to be higher than the current best bid, so the last bid of a
+# listing is always the best one. The outbid amount is credited to the previous
+# bidder in bidRefunds and can be withdrawn with withdrawRefund.
+# @param _id The id of the listing
+# @return The number of the bid in idToBid
+@payable
+@external
+def placeBid(_id: uint256) -> uint256:
+    listing: Listing = self._getListing(_id)
+    assert listing._status != 0, "MarketPlace: Listing doesn't exist"
+    assert listing._status == 1, "MarketPlace: Token no longer for sale"
+
+    bidNumber: uint256 = self.listingToBidNumber[_id]
+    bestBid: Bid = self.idToBid[_id][bidNumber]
+    assert msg.value > bestBid._bid, "MarketPlace: Bid too low"
+
+    # refund the outbid bidder
+    if bestBid._bidder != ZERO_ADDRESS:
+        self.bidRefunds[bestBid._bidder] += bestBid._bid
+
+    bidNumber += 1
+    self.idToBid[_id][bidNumber] = Bid({_bidder: msg.sender, _bid: msg.value})
+    self.listingToBidNumber[_id] = bidNumber
+    log BidEvent(_id, msg.sender, msg.value)
+    return bidNumber
+
+
+# @notice Get the current best bid of a listing
+# @param _id The id of the listing
+# @return The best bid (bidder, bid), empty if there is none
+@view
+@external
+def bestBid(_id: uint256) -> Bid:
+    return self.idToBid[_id][self.listingToBidNumber[_id]]
+
+
+# @notice Sell the token of a listing to its best bidder
+# @dev Only the seller can accept, the bid is paid like a buy at the bid price
+# @param _id The id of the listing
+# @return The id of the listing
+@external
+def acceptBid(_id: uint256) -> uint256:
+    listing: Listing = self._getListing(_id)
+    assert listing._status == 1, "MarketPlace: Token not for sale (already sold, cancel or doesn't exist)"
+    assert listing._seller == msg.sender, "MarketPlace: Only the seller can accept a bid"
+
+    bidNumber: uint256 = self.listingToBidNumber[_id]
+    bestBid: Bid = self.idToBid[_id][bidNumber]
+    assert bestBid._bidder != ZERO_ADDRESS, "MarketPlace: No bid to accept"
+    self.idToBid[_id][bidNumber] = empty(Bid)
+
+    return self._settleSale(_id, listing, bestBid._bidder, bestBid._bid)
+
+
+# @notice Withdraw the current best bid of a listing
+# @dev Only the best bidder can withdraw, the listing is then left without bid
+# @param _id The id of the listing
+# @return The amount sent back
+@external
+def withdrawBid(_id: uint256) -> uint256:
+    bidNumber: uint256 = self.listingToBidNumber[_id]
+    bestBid: Bid = self.idToBid[_id][bidNumber]
+    assert bestBid._bidder != ZERO_ADDRESS, "MarketPlace: No bid to withdraw"
+    assert bestBid._bidder == msg.sender, "MarketPlace: Only the best bidder can withdraw"
+    self.idToBid[_id][bidNumber] = empty(Bid)
+    log BidEvent(_id, msg.sender, 0)
+    send(msg.sender, bestBid._bid)
+    return bestBid._bid
+
+
+# @notice Withdraw the bids that have been outbid
+# @return The amount sent back
+@external
+def withdrawRefund() -> uint256:
+    amount: uint256 = self.bidRefunds[msg.sender]
+    assert amount > 0, "MarketPlace: Nothing to refund"
+    self.bidRefunds[msg.sender] = 0
+    send(msg.sender, amount)
+    return amount
+
+
+# @notice List up to MAX_BUNDLE_SIZE tokens to be sold together for a single price
+# @dev The postingFee is charged once for the bundle, and the operator approval
+# is only checked when the collection changes, so group the tokens by collection
+# @param _nfts The collections of the tokens, only the first _size entries are used
+# @param _tokenIds The ids of the tokens
+# @param _size The number of tokens in the bundle
+# @param _price The price of the whole bundle, in wei
+# @return The id of the bundle
+@payable
+@external
+def sellBundle(_nfts: address[MAX_BUNDLE_SIZE], _tokenIds: uint256[MAX_BUNDLE_SIZE], _size: uint256, _price: uint256) -> uint256:
+    assert _size > 0 and _size <= MAX_BUNDLE_SIZE, "MarketPlace: Invalid bundle size"
+    self._chargePostingFee(msg.value, 1)
+
+    id: uint256 = self.bundleCount
+    lastNft: address = ZERO_ADDRESS
+    for i in range(MAX_BUNDLE_SIZE):
+        if i >= _size:
+            break
+        nft: address = _nfts[i]
+        self._checkSeller(msg.sender, nft, _tokenIds[i])
+        # Check that we are operator for the seller nft, once per collection
+        if nft != lastNft:
+            assert NFToken(nft).isApprovedForAll(msg.sender, self), "MarketPlace: The marketplace doesn't have authorization to sell this token for this user"
+            lastNft = nft
+        self.bundleNfts[id][i] = nft
+        self.bundleTokenIds[id][i] = _tokenIds[i]
+    self.bundles[id] = Bundle({_seller: msg.sender, _price: _price, _size: _size, _status: 1})
+    self.bundleCount = id + 1
+    log BundleUpdated(id, msg.sender, _price, 1)
     return id
 
 
+# @notice Buy all the tokens of a bundle
+# @dev The seller is paid and both parties rewarded once for the whole bundle.
+# OPEN listings of the tokens are cancelled, any ether sent above the price is
+# refunded.
+# @param _bundleId The id of the bundle
+# @return The id of the bundle
+@payable
+@external
+def buyBundle(_bundleId: uint256) -> uint256:
+    bundle: Bundle = self.bundles[_bundleId]
+    assert bundle._status != 0, "MarketPlace: Bundle doesn't exist"
+    assert bundle._status == 1, "MarketPlace: Bundle no longer for sale"
+    assert msg.value >= bundle._price, "MarketPlace: Not enough ether sent"
+    self.bundles[_bundleId]._status = 2
+
+    for i in range(MAX_BUNDLE_SIZE):
+        if i >= bundle._size:
+            break
+        nft: address = self.bundleNfts[_bundleId][i]
+        tokenId: uint256 = self.bundleTokenIds[_bundleId][i]
+        self._cancelTokenListing(nft, tokenId)
+        NFToken(nft).transferFrom(bundle._seller, msg.sender, tokenId)
+
+    fee: uint256 = bundle._price*self._sellingFee()/100
+    self._paySeller(bundle._seller, bundle._price - fee)
+    self._recordSale(ZERO_ADDRESS, bundle._price, fee)
+    self._rewardMarketCoin(bundle._seller, bundle._price/10)
+    self._rewardMarketCoin(msg.sender, bundle._price/10)
+    log BundleSale(_bundleId, bundle._seller, msg.sender, bundle._price)
+    self._refundExcess(msg.sender, msg.value, bundle._price)
+    return _bundleId
+
+
+# @notice Cancel an OPEN bundle
+# @param _bundleId The id of the bundle
+# @return The id of the bundle
+@external
+def cancelBundle(_bundleId: uint256) -> uint256:
+    bundle: Bundle = self.bundles[_bundleId]
+    assert msg.sender == bundle._seller, "MarketPlace: Only the seller can cancel"
+    assert bundle._status == 1, "MarketPlace: Bundle not for sale (already sold or cancel)"
+    self.bundles[_bundleId]._status = 3
+    log BundleUpdated(_bundleId, msg.sender, bundle._price, 3)
+    return _bundleId
+
+
+# @notice Offer to buy any _quantity tokens of a collection at _price each
+# @dev The ether for all the tokens is escrowed, msg.value must be _price * _quantity
+# @param _nft The address of the collection
+# @param _price The price offered for each token, in wei
+# @param _quantity The number of tokens to buy
+# @return The id of the offer
+@payable
+@external
+def makeCollectionOffer(_nft: address, _price: uint256, _quantity: uint256) -> uint256:
+    assert _quantity > 0, "MarketPlace: Quantity must be positive"
+    assert msg.value == _price * _quantity, "MarketPlace: Amount sent must be price * quantity"
+    id: uint256 = self.offerCount
+    self.offers[id] = Offer({_buyer: msg.sender, _nft: _nft, _price: _price, _quantity: _quantity})
+    self.offerCount = id + 1
+    log OfferUpdated(id, msg.sender, _nft, _price, _quantity)
+    return id
+
+
+# @notice Sell a token to a collection offer
+# @dev The caller must be the owner or approved of the token, the owner is paid
+# like for a buy. An OPEN listing of the token is cancelled.
+# @param _offerId The id of the offer
+# @param _tokenId The token of the collection of the offer to sell
+# @return The number of tokens left to buy in the offer
+@external
+def acceptCollectionOffer(_offerId: uint256, _tokenId: uint256) -> uint256:
+    offer: Offer = self.offers[_offerId]
+    assert offer._quantity > 0, "MarketPlace: Offer not active"
+    self._checkSeller(msg.sender, offer._nft, _tokenId)
+
+    quantity: uint256 = offer._quantity - 1
+    self.offers[_offerId]._quantity = quantity
+    seller: address = NFToken(offer._nft).ownerOf(_tokenId)
+    self._cancelTokenListing(offer._nft, _tokenId)
+    self._paySellerAndTransfer(seller, offer._nft, _tokenId, offer._buyer, offer._price)
+    log OfferUpdated(_offerId, offer._buyer, offer._nft, offer._price, quantity)
+    log Sale(NO_LISTING, seller, offer._buyer, offer._price, offer._nft, _tokenId)
+    return quantity
+
+
+# @notice Cancel a collection offer and get back the ether of the tokens not bought
+# @param _offerId The id of the offer
+# @return The amount sent back
+@external
+def cancelCollectionOffer(_offerId: uint256) -> uint256:
+    offer: Offer = self.offers[_offerId]
+    assert offer._buyer == msg.sender, "MarketPlace: Only the buyer can cancel an offer"
+    assert offer._quantity > 0, "MarketPlace: Offer not active"
+    self.offers[_offerId]._quantity = 0
+    amount: uint256 = offer._price * offer._quantity
+    log OfferUpdated(_offerId, msg.sender, offer._nft, offer._price, 0)
+    send(msg.sender, amount)
+    return amount
+
+
+# @notice Withdraw the fees earned by the marketplace
+# @param _amount The amount to send to the owner, in wei
 @external
 def withdraw(_amount: uint256):
     assert msg.sender == self.owner, "MarketPlace: Only the owner can withdraw"
+    # the rest of the balance is owed to sellers, bidders and collection offers
+    feesWithdrawn: uint256 = self.feesWithdrawn + _amount
+    assert feesWithdrawn <= shift(self.stats, -160), "MarketPlace: Amount above the fees earned"
+    self.feesWithdrawn = feesWithdrawn
     send(self.owner, _amount)
 
 
-#TODO maybe the mint price should only be in here
+# @notice Read the running aggregates of the sales in one call
+# @param _nft The collection of the per collection aggregates
+# @return The volume in wei, the number of sales, the posting and selling fees
+# earned and the fees withdrawn by the owner, then the volume and number of
+# sales of _nft
+@view
 @external
-def mintMarketNFT():
-    # Receive the marketcoin amount
-    mintPrice: uint256 = MarketNFT(self.marketNFT).mintPrice()
-    MarketCoin(self.marketCoin).transferFrom(msg.sender, self.marketplace, mintPrice)
-    # Mint the NFT
-    MarketNFT(self.marketNFT).mint(msg.sender)
-    
+def getStats(_nft: address) -> (uint256, uint256, uint256, uint256, uint256, uint256):
+    stats: uint256 = self.stats
+    nftStats: uint256 = self.nftStats[_nft]
+    return (
+        bitwise_and(stats, 2**112 - 1),
+        bitwise_and(shift(stats, -112), 2**48 - 1),
+        shift(stats, -160),
+        self.feesWithdrawn,
+        bitwise_and(nftStats, 2**192 - 1),
+        shift(nftStats, -192)
+    )
 
 
-#TODO handle if seller transfer nft -> check in the front end if seller still owner
+# @notice Mint all the MarketCoin rewards accrued by msg.sender
+# @return The amount of MarketCoin minted
+@external
+def claimRewards() -> uint256:
+    amount: uint256 = self.rewards[msg.sender]
+    assert amount > 0, "MarketPlace: No rewards to claim"
+    self.rewards[msg.sender] = 0
+    self._mintMarketCoin(msg.sender, amount)
+    return amount
 
 
+# @notice Withdraw the ether of the sales made in escrowProceeds mode
+# @return The amount sent
+@external
+def withdrawProceeds() -> uint256:
+    amount: uint256 = self.proceeds[msg.sender]
+    assert amount > 0, "MarketPlace: No proceeds to withdraw"
+    self.proceeds[msg.sender] = 0
+    send(msg.sender, amount)
+    return amount
+
 
+# @notice Mint MarketNFTs paid with MarketCoin
+# @dev The MarketCoin are burned without allowance, no approve is needed
+# @param _quantity The number of MarketNFTs to mint, at most MAX_MINT_BATCH of the MarketNFT
+@external
+def mintMarketNFT(_quantity: uint256 = 1):
+    # Burn the marketcoin amount
+    packed: uint256 = self.mintConfig
+    marketCoin: address = self._marketCoin()
+    MarketCoin(marketCoin).burnFrom(msg.sender, shift(packed, -160) * _quantity)
+    # Mint the NFTs in a single run
+    MarketNFT(convert(bitwise_and(packed, 2**160 - 1), address)).mintBatch(msg.sender, _quantity)
@@ -0,0 +1,168 @@
+#NFT MarketPlace for ERC-1155 tokens
+# @version 0.3.1
+
+# A listing is a quantity of units of a token sold at a unit price, buyers can
+# buy any number of the units left in one call.
+# Kept out of the NFTMarketPlace so it stays under the contract size limit, the
+# MarketCoin rewards are given by the NFTMarketPlace, where this contract must
+# be set as an extension.
+
+
+# interface for a ERC-1155 token
+interface MultiToken:
+    def balanceOf(_owner: address, _id: uint256) -> uint256: view
+    def isApprovedForAll(_owner: address, _operator: address) -> bool: view
+    def safeTransferFrom(_from: address, _to: address, _id: uint256, _value: uint256, _data: Bytes[1024]): nonpayable
+
+
+# interface for the NFTMarketPlace
+interface NFTMarketPlace:
+    def rewardMarketCoin(_to: address, _amount: uint256): nonpayable
+
+
+# The events are named like the ones of the NFTMarketPlace but have their own
+# fields, so their signatures differ: Listed carries the quantity and the unit
+# price, and Sale the quantity bought and no nft, which is only in Listed. The
+# listing id and the seller are indexed, and the nft in Listed. The units left
+# in a listing are its quantity minus the quantities of its sales.
+event Listed:
+    _id: indexed(uint256)
+    _seller: indexed(address)
+    _nft: indexed(address)
+    _tokenId: uint256
+    _quantity: uint256
+    _unitPrice: uint256
+
+event Cancelled:
+    _id: indexed(uint256)
+
+event Sale:
+    _id: indexed(uint256)
+    _seller: indexed(address)
+    _buyer: address
+    _quantity: uint256
+    _price: uint256
+
+struct Listing:
+    _seller: address
+    _nft: address
+    _tokenId: uint256
+    _unitPrice: uint256
+    _quantity: uint256  # number of units left to sell
+    _status: uint8 # 0-DOESNT EXIST, 1-OPEN, 2-SOLD, 3-CANCELED
+
+
+currentId: public(uint256)
+idToListing: public(HashMap[uint256, Listing])
+postingFee: public(uint256) # in wei
+sellingFee: public(uint256) # in %
+owner: public(address)
+MARKETPLACE: immutable(address)  # Address of the NFTMarketPlace, set at deployment
+
+
+@external
+def __init__(_marketplace: address):
+    self.owner = msg.sender
+    MARKETPLACE = _marketplace
+
+
+@view
+@external
+def marketplace() -> address:
+    return MARKETPLACE
+
+
+@external
+def setPostingFee(_newFee: uint256):
+    assert msg.sender == self.owner, "MarketPlace: Only the owner can do that"
+    self.postingFee = _newFee
+
+@external
+def setSellingFee(_newFee: uint256):
+    assert msg.sender == self.owner, "MarketPlace: Only the owner can do that"
+    assert _newFee <= 100, "MarketPlace: Invalid fee"
+    self.sellingFee = _newFee
+
+
+# @notice List _quantity units of a token at _unitPrice each
+# @dev The marketplace must be operator of the seller for the nft
+# @param _nft The address of the ERC-1155 token
+# @param _tokenId The id of the token
+# @param _quantity The number of units to sell
+# @param _unitPrice The price of one unit, in wei
+# @return The id of the listing
+@payable
+@external
+def sell(_nft: address, _tokenId: uint256, _quantity: uint256, _unitPrice: uint256) -> uint256:
+    assert msg.value >= self.postingFee, "MarketPlace: Amount sent is below postingFee"
+    assert _quantity > 0, "MarketPlace: Quantity must be positive"
+    assert MultiToken(_nft).balanceOf(msg.sender, _tokenId) >= _quantity, "MarketPlace: Not enough units to sell"
+
+    # Check that we are operator for the seller nft
+    assert MultiToken(_nft).isApprovedForAll(msg.sender, self), "MarketPlace: The marketplace doesn't have authorization to sell this token for this user"
+
+    id: uint256 = self.currentId
+    self.idToListing[id] = Listing({
+        _seller: msg.sender,
+        _nft: _nft,
+        _tokenId: _tokenId,
+        _unitPrice: _unitPrice,
+        _quantity: _quantity,
+        _status: 1
+    })
+    self.currentId = id + 1
+    log Listed(id, msg.sender, _nft, _tokenId, _quantity, _unitPrice)
+    return id
+
+
+@external
+def cancelSell(_id: uint256) -> uint256:
+    listing: Listing = self.idToListing[_id]
+    assert msg.sender == listing._seller, "MarketPlace: Only the seller can cancel"
+    assert listing._status == 1, "MarketPlace: Token not for sale (already sold, cancel or doesn't exist)"
+    self.idToListing[_id]._status = 3
+    log Cancelled(_id)
+    return _id
+
+
+# @notice Buy _quantity units of a listing
+# @dev Only the quantity left is written, and the status once all the units are
+# sold. The units are sent with a single safeTransferFrom.
+# @param _id The id of the listing
+# @param _quantity The number of units to buy
+# @return The number of units left in the listing
+@payable
+@external
+def buy(_id: uint256, _quantity: uint256) -> uint256:
+    listing: Listing = self.idToListing[_id]
+    assert listing._status != 0, "MarketPlace: Listing doesn't exist"
+    assert listing._status == 1, "MarketPlace: Token no longer for sale"
+    assert _quantity > 0 and _quantity <= listing._quantity, "MarketPlace: Not enough units for sale"
+
+    price: uint256 = listing._unitPrice * _quantity
+    assert msg.value >= price, "MarketPlace: Not enough ether sent"
+
+    quantity: uint256 = listing._quantity - _quantity
+    self.idToListing[_id]._quantity = quantity
+    if quantity == 0:
+        self.idToListing[_id]._status = 2
+
+    # Pay the seller
+    fee: uint256 = price*self.sellingFee/100
+    send(listing._seller, price - fee)
+
+    # Transfer the units
+    MultiToken(listing._nft).safeTransferFrom(listing._seller, msg.sender, listing._tokenId, _quantity, b"")
+
+    # Reward some MarketCoin token
+    NFTMarketPlace(MARKETPLACE).rewardMarketCoin(listing._seller, price/10)
+    NFTMarketPlace(MARKETPLACE).rewardMarketCoin(msg.sender, price/10)
+
+    log Sale(_id, listing._seller, msg.sender, _quantity, price)
+    return quantity
+
+
+@external
+def withdraw(_amount: uint256):
+    assert msg.sender == self.owner, "MarketPlace: Only the owner can withdraw"
+    send(self.owner, _amount)
@@ -0,0 +1,131 @@
+#NFT MarketPlace Lens
+# @version 0.3.1
+
+# Read-only helper for the NFTMarketPlace: returns in a single call the data a
+# frontend would otherwise fetch with one call per listing.
+# Kept out of the marketplace so it stays under the contract size limit.
+
+
+struct Listing:
+    _seller: address
+    _nft: address
+    _tokenId: uint256
+    _price: uint256
+    _status: uint8 # 0-DOESNT EXIST, 1-OPEN, 2-SOLD, 3-CANCELED
+
+
+# interface for the NFTMarketPlace
+interface NFTMarketPlace:
+    def currentId() -> uint256: view
+    def idToListing(_id: uint256) -> Listing: view
+    def nftOpenListingCount(_nft: address) -> uint256: view
+    def nftOpenListings(_nft: address, _index: uint256) -> uint256: view
+    def sellerListingCount(_seller: address) -> uint256: view
+    def sellerListings(_seller: address, _index: uint256) -> uint256: view
+    def isListingValid(_id: uint256) -> bool: view
+
+
+MAX_PAGE: constant(uint256) = 100  # max number of listings returned in a page
+MAX_SCAN: constant(uint256) = 1000  # max number of listings scanned by getListings
+MAX_VALIDITY_CHECK: constant(uint256) = 256  # max number of listings checked by areListingsValid
+
+marketplace: public(address)  # Address of the NFTMarketPlace
+
+
+@external
+def __init__(_marketplace: address):
+    self.marketplace = _marketplace
+
+
+# @notice Get a page of listings with a given status
+# @dev Scans at most MAX_SCAN listings from _start, call again from the returned
+# cursor until it is equal to currentId to go through all the listings
+# @param _start The id of the first listing to scan
+# @param _count The max number of listings to return, at most MAX_PAGE
+# @param _statusFilter The status of the listings to return, 0 for any status
+# @return The ids of the listings found, the listings, the number of listings
+# found and the id of the next listing to scan
+@view
+@external
+def getListings(_start: uint256, _count: uint256, _statusFilter: uint8) -> (uint256[MAX_PAGE], Listing[MAX_PAGE], uint256, uint256):
+    ids: uint256[MAX_PAGE] = empty(uint256[MAX_PAGE])
+    listings: Listing[MAX_PAGE] = empty(Listing[MAX_PAGE])
+    found: uint256 = 0
+    count: uint256 = min(_count, MAX_PAGE)
+    end: uint256 = NFTMarketPlace(self.marketplace).currentId()
+    cursor: uint256 = _start
+
+    for i in range(MAX_SCAN):
+        if found >= count or cursor >= end:
+            break
+        listing: Listing = NFTMarketPlace(self.marketplace).idToListing(cursor)
+        if _statusFilter == 0 or listing._status == _statusFilter:
+            ids[found] = cursor
+            listings[found] = listing
+            found += 1
+        cursor += 1
+    return ids, listings, found, cursor
+
+
+# @notice Get a page of the OPEN listings of an nft
+# @dev The order of the OPEN listings changes when one is removed
+# @param _nft The address of the nft
+# @param _start The index of the first listing to return
+# @param _count The max number of listings to return, at most MAX_PAGE
+# @return The ids of the listings, the listings and the number of listings found
+@view
+@external
+def getNftOpenListings(_nft: address, _start: uint256, _count: uint256) -> (uint256[MAX_PAGE], Listing[MAX_PAGE], uint256):
+    ids: uint256[MAX_PAGE] = empty(uint256[MAX_PAGE])
+    listings: Listing[MAX_PAGE] = empty(Listing[MAX_PAGE])
+    found: uint256 = 0
+    end: uint256 = min(NFTMarketPlace(self.marketplace).nftOpenListingCount(_nft), _start + min(_count, MAX_PAGE))
+
+    for i in range(MAX_PAGE):
+        if _start + i >= end:
+            break
+        ids[i] = NFTMarketPlace(self.marketplace).nftOpenListings(_nft, _start + i)
+        listings[i] = NFTMarketPlace(self.marketplace).idToListing(ids[i])
+        found += 1
+    return ids, listings, found
+
+
+# @notice Get a page of the listings of a seller, whatever their status
+# @param _seller The address of the seller
+# @param _start The index of the first listing to return
+# @param _count The max number of listings to return, at most MAX_PAGE
+# @return The ids of the listings, the listings and the number of listings found
+@view
+@external
+def getSellerListings(_seller: address, _start: uint256, _count: uint256) -> (uint256[MAX_PAGE], Listing[MAX_PAGE], uint256):
+    ids: uint256[MAX_PAGE] = empty(uint256[MAX_PAGE])
+    listings: Listing[MAX_PAGE] = empty(Listing[MAX_PAGE])
+    found: uint256 = 0
+    end: uint256 = min(NFTMarketPlace(self.marketplace).sellerListingCount(_seller), _start + min(_count, MAX_PAGE))
+
+    for i in range(MAX_PAGE):
+        if _start + i >= end:
+            break
+        ids[i] = NFTMarketPlace(self.marketplace).sellerListings(_seller, _start + i)
+        listings[i] = NFTMarketPlace(self.marketplace).idToListing(ids[i])
+        found += 1
+    return ids, listings, found
+
+
+# @notice Check if several listings can be bought, see isListingValid of the marketplace
+# @dev isListingValid doesn't revert for a burned token, so one dead listing
+# doesn't fail the whole batch
+# @param _ids The ids of the listings, only the first _count entries are used
+# @param _count The number of listings to check
+# @return A bitmap where bit i is set if the listing _ids[i] can be bought
+@view
+@external
+def areListingsValid(_ids: uint256[MAX_VALIDITY_CHECK], _count: uint256) -> uint256:
+    assert _count <= MAX_VALIDITY_CHECK, "MarketPlace: Batch too big"
+    valid: uint256 = 0
+    for i in range(MAX_VALIDITY_CHECK):
+        if i >= _count:
+            break
+        if NFTMarketPlace(self.marketplace).isListingValid(_ids[i]):
+            valid = bitwise_or(valid, shift(1, convert(i, int128)))
+    return valid
@@ -82,21 +82,16 @@ def _addToken(_to: address, _tokenId: uint256):
     self.totalSupply += 1
 
 
+# owner, approval and counts are written once and totalSupply is left alone,
+# the ownership check also covers tokens that don't exist
 @internal
-def _removeToken(_from: address, _tokenId: uint256):
+def _transfer(_from: address, _to: address, _tokenId: uint256):
+    assert _to != ZERO_ADDRESS, "Can't transfer to null address"
     assert _from == self.idToOwner[_tokenId], "Not owner of the token"
-    self.idToOwner[_tokenId] = ZERO_ADDRESS
+    self.idToOwner[_tokenId] = _to
     self.idToApproved[_tokenId] = ZERO_ADDRESS
     self.ownerToCount[_from] -= 1
-    self.totalSupply -= 1
-
-
-@internal
-def _transfer(_from: address, _to: address, _tokenId: uint256):
-    assert _to != ZERO_ADDRESS, "Can't transfer to null address"
-    assert _tokenId < self.totalSupply, "Token doesn't exist"
-    self._removeToken(_from, _tokenId)
-    self._addToken(_to, _tokenId)
+    self.ownerToCount[_to] += 1
     log Transfer(_from, _to, _tokenId)
 
 
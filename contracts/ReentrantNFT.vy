@@ -0,0 +1,58 @@
+# Reentrant NFT
+# @version 0.3.1
+
+# ERC-721 that sells its own tokens on the marketplace and tries to cancel the
+# listing from transferFrom, while it is being bought. Only used to test the
+# marketplace against reentrancy.
+
+interface NFTMarketPlace:
+    def sell(_nft: address, _tokenId: uint256, _price: uint256) -> uint256: payable
+
+
+marketplace: public(address)
+listingId: public(uint256)  # last listing made with sell
+ownerOf: public(HashMap[uint256, address])
+
+
+@external
+def __init__(_marketplace: address):
+    self.marketplace = _marketplace
+
+
+# receive the proceeds of the sales
+@payable
+@external
+def __default__():
+    pass
+
+
+@view
+@external
+def getApproved(_tokenId: uint256) -> address:
+    return ZERO_ADDRESS
+
+
+@view
+@external
+def isApprovedForAll(_owner: address, _operator: address) -> bool:
+    return True
+
+
+# @notice Mint a token to this contract and list it on the marketplace
+@external
+def sell(_tokenId: uint256, _price: uint256) -> uint256:
+    self.ownerOf[_tokenId] = self
+    self.listingId = NFTMarketPlace(self.marketplace).sell(self, _tokenId, _price)
+    return self.listingId
+
+
+# @dev Re-enter the marketplace as the seller to cancel the listing being
+# bought, the failure of the call is ignored
+@external
+def transferFrom(_from: address, _to: address, _tokenId: uint256):
+    success: bool = raw_call(
+        self.marketplace,
+        _abi_encode(self.listingId, method_id=method_id("cancelSell(uint256)")),
+        revert_on_failure=False
+    )
+    self.ownerOf[_tokenId] = _to
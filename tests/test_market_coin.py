@@ -1,6 +1,9 @@
 import pytest
 from scripts.helpful_scripts import ZERO_ADDRESS, get_account, ONE, POINT_ONE, CENT
 import brownie
+from brownie import accounts, chain
+from eth_keys import keys
+from eth_utils import keccak
 
 
 NAME = "MarketCoin"
@@ -8,6 +11,7 @@ SYMBOL = "MC"
 DECIMALS = 18
 # SUPPLY = 10 ** 6
 # TOTAL_SUPPLY = 10 ** 6 * 10 ** 8
+DEADLINE = 2 ** 40
 
 
 @pytest.fixture
@@ -117,6 +121,37 @@ def test_burn_revert(marketCoin):
         marketCoin.burn(CENT, {"from": owner})
 
 
+def test_burnFrom(marketCoin):
+    owner = get_account(index=8)
+    account = get_account()
+    marketCoin.mint(account, CENT, {"from": owner})
+
+    # no allowance needed for the owner
+    tx = marketCoin.burnFrom(account, CENT / 2, {"from": owner})
+
+    assert marketCoin.balanceOf(account) == CENT / 2
+    assert marketCoin.totalSupply() == CENT / 2
+
+    # Test Transfer Event
+    assert len(tx.events) == 1
+    assert tx.events[0]["_from"] == account
+    assert tx.events[0]["_to"] == ZERO_ADDRESS
+    assert tx.events[0]["_value"] == CENT / 2
+
+
+def test_burnFrom_revert(marketCoin):
+    owner = get_account(index=8)
+    account = get_account()
+    marketCoin.mint(account, CENT, {"from": owner})
+
+    # fails because account not owner
+    with brownie.reverts("MarketCoin: Only owner can burn token of others"):
+        marketCoin.burnFrom(account, CENT, {"from": account})
+    # fails because balance too low: underflow
+    with brownie.reverts():
+        marketCoin.burnFrom(account, CENT + 1, {"from": owner})
+
+
 ############## TRANSFER #######################
 
 
@@ -256,3 +291,85 @@ def test_transferFrom_revert(marketCoin, _value=ONE):
 
     assert marketCoin.balanceOf(acc1) == ONE - _value / 2
     assert marketCoin.balanceOf(acc2) == _value / 2
+
+
+############## PERMIT #######################
+
+
+def _word(value):
+    if isinstance(value, int):
+        return value.to_bytes(32, "big")
+    return bytes(12) + bytes.fromhex(str(value)[2:])
+
+
+# sign an EIP-2612 Permit with the private key of a local account
+def sign_permit(marketCoin, owner, spender, value, nonce, deadline):
+    permit_hash = keccak(
+        keccak(b"Permit(address owner,address spender,uint256 value,uint256 nonce,uint256 deadline)")
+        + _word(owner.address)
+        + _word(spender.address)
+        + _word(value)
+        + _word(nonce)
+        + _word(deadline)
+    )
+    digest = keccak(b"\x19\x01" + bytes(marketCoin.DOMAIN_SEPARATOR()) + permit_hash)
+    signature = keys.PrivateKey(bytes.fromhex(owner.private_key[2:])).sign_msg_hash(digest)
+    return signature.v + 27, _word(signature.r), _word(signature.s)
+
+
+def test_DOMAIN_SEPARATOR(marketCoin):
+    expected = keccak(
+        keccak(b"EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)")
+        + keccak(b"MarketCoin")
+        + keccak(b"1")
+        + _word(chain.id)
+        + _word(marketCoin.address)
+    )
+    assert marketCoin.DOMAIN_SEPARATOR() == "0x" + expected.hex()
+
+
+def test_permit(marketCoin, _value=ONE):
+    owner = get_account(index=8)
+    signer = accounts.add()
+    acc1 = get_account(index=1)
+    marketCoin.mint(signer, _value, {"from": owner})
+
+    # anybody can send the signature of signer
+    v, r, s = sign_permit(marketCoin, signer, acc1, _value, 0, DEADLINE)
+    tx = marketCoin.permit(signer, acc1, _value, DEADLINE, v, r, s, {"from": acc1})
+
+    assert marketCoin.allowance(signer, acc1) == _value
+    assert marketCoin.nonces(signer) == 1
+    marketCoin.transferFrom(signer, acc1, _value, {"from": acc1})
+    assert marketCoin.balanceOf(acc1) == _value
+
+    # Test Approval Event
+    assert len(tx.events) == 1
+    assert tx.events[0]["_owner"] == signer
+    assert tx.events[0]["_spender"] == acc1
+    assert tx.events[0]["_value"] == _value
+
+
+def test_permit_revert(marketCoin, _value=ONE):
+    signer = accounts.add()
+    acc1 = get_account(index=1)
+    v, r, s = sign_permit(marketCoin, signer, acc1, _value, 0, DEADLINE)
+
+    # fails because the signed value is different
+    with brownie.reverts("MarketCoin: Invalid signature"):
+        marketCoin.permit(signer, acc1, _value + 1, DEADLINE, v, r, s, {"from": acc1})
+    # fails because signer didn't sign it
+    with brownie.reverts("MarketCoin: Invalid signature"):
+        marketCoin.permit(acc1, acc1, _value, DEADLINE, v, r, s, {"from": acc1})
+
+    marketCoin.permit(signer, acc1, _value, DEADLINE, v, r, s, {"from": acc1})
+    # fails because the nonce has been used
+    with brownie.reverts("MarketCoin: Invalid signature"):
+        marketCoin.permit(signer, acc1, _value, DEADLINE, v, r, s, {"from": acc1})
+
+    # fails because the deadline is passed
+    v, r, s = sign_permit(marketCoin, signer, acc1, _value, 1, 1)
+    with brownie.reverts("MarketCoin: Permit expired"):
+        marketCoin.permit(signer, acc1, _value, 1, v, r, s, {"from": acc1})
+    with brownie.reverts("MarketCoin: Invalid owner"):
+        marketCoin.permit(ZERO_ADDRESS, acc1, _value, DEADLINE, v, r, s, {"from": acc1})
@@ -6,6 +6,7 @@ import brownie
 NAME = "MarketNFT"
 SYMBOL = "MNFT"
 MINT_PRICE = ONE
+MAX_MINT_BATCH = 20
 
 
 @pytest.fixture
@@ -123,6 +124,71 @@ def test_mint_revert(marketNFT):
     marketNFT.mint(account, {"from": account})
 
 
+def test_mintBatch(marketNFT):
+    account = get_account()
+    acc1 = get_account(index=1)
+    marketNFT.mint(account, {"from": account})
+    tx = marketNFT.mintBatch(acc1, 5, {"from": account})
+
+    assert marketNFT.balanceOf(acc1) == 5
+    assert marketNFT.totalSupply() == 6
+    assert marketNFT.nextTokenId() == 6
+    assert [marketNFT.ownerOf(i) for i in range(1, 6)] == [acc1] * 5
+    # the tokens of the run resolve to the owner of its first token
+    assert [marketNFT.idToOwner(i) for i in range(1, 6)] == [acc1] * 5
+    assert marketNFT.idToOwner(6) == ZERO_ADDRESS
+    assert [marketNFT.tokenByIndex(i) for i in range(6)] == [0, 1, 2, 3, 4, 5]
+    assert [marketNFT.tokenOfOwnerByIndex(acc1, i) for i in range(5)] == [1, 2, 3, 4, 5]
+    with brownie.reverts("MarketNFT: Token doesn't exist"):
+        marketNFT.ownerOf(6)
+
+    # Test Event
+    assert len(tx.events) == 5
+    assert tx.events[0]["_from"] == ZERO_ADDRESS
+    assert tx.events[0]["_to"] == acc1
+    assert [e["_tokenId"] for e in tx.events] == [1, 2, 3, 4, 5]
+
+
+def test_mintBatch_split_run(marketNFT):
+    account = get_account()
+    acc1 = get_account(index=1)
+    acc2 = get_account(index=2)
+    marketNFT.mintBatch(acc1, 6, {"from": account})
+
+    # transfer and burn in the middle of the run, the other tokens keep their owner
+    marketNFT.transferFrom(acc1, acc2, 2, {"from": acc1})
+    marketNFT.burn(4, {"from": account})
+    assert [marketNFT.ownerOf(i) for i in (0, 1, 3, 5)] == [acc1] * 4
+    assert marketNFT.ownerOf(2) == acc2
+    with brownie.reverts("MarketNFT: Token doesn't exist"):
+        marketNFT.ownerOf(4)
+    assert marketNFT.idToOwner(3) == acc1
+    assert marketNFT.idToOwner(4) == ZERO_ADDRESS
+
+    assert marketNFT.balanceOf(acc1) == 4
+    assert marketNFT.totalSupply() == 5
+    assert [marketNFT.tokenOfOwnerByIndex(acc1, i) for i in range(4)] == [0, 1, 5, 3]
+    assert marketNFT.tokenOfOwnerByIndex(acc2, 0) == 2
+    assert [marketNFT.tokenByIndex(i) for i in range(5)] == [0, 1, 2, 3, 5]
+
+
+def test_mintBatch_revert(marketNFT):
+    account = get_account()
+    acc1 = get_account(index=1)
+
+    with brownie.reverts("MarketNFT: Only owner of MarketNFT can mint"):
+        marketNFT.mintBatch(acc1, 2, {"from": acc1})
+    with brownie.reverts("MarketNFT: Invalid quantity"):
+        marketNFT.mintBatch(acc1, 0, {"from": account})
+    with brownie.reverts("MarketNFT: Invalid quantity"):
+        marketNFT.mintBatch(acc1, MAX_MINT_BATCH + 1, {"from": account})
+    with brownie.reverts("MarketNFT: Can't transfer to null address"):
+        marketNFT.mintBatch(ZERO_ADDRESS, 2, {"from": account})
+
+    marketNFT.mintBatch(acc1, MAX_MINT_BATCH, {"from": account})
+    assert marketNFT.ownerOf(MAX_MINT_BATCH - 1) == acc1
+
+
 def test_burn(marketNFT):
     account = get_account()
     acc1 = get_account(index=1)
@@ -244,6 +310,10 @@ def test_transferFrom(marketNFT):
     assert marketNFT.ownerOf(0) == account
     assert marketNFT.ownerOf(1) == acc2
     assert marketNFT.ownerOf(2) == acc2
+    assert marketNFT.balanceOf(account) == 1
+    assert marketNFT.balanceOf(acc1) == 0
+    assert marketNFT.balanceOf(acc2) == 2
+    assert marketNFT.totalSupply() == 3
 
     # Test Event
     assert len(tx.events) == 1
@@ -430,9 +500,53 @@ def test_add_token_revert(marketNFT):
         marketNFT.mint(ZERO_ADDRESS, {"from": account})
 
 
+def test_tokenByIndex(marketNFT):
+    account = get_account()
+    acc1 = get_account(index=1)
+    for i in range(4):
+        marketNFT.mint(acc1, {"from": account})
+    assert [marketNFT.tokenByIndex(i) for i in range(4)] == [0, 1, 2, 3]
+
+    # transfer doesn't change the order
+    marketNFT.transferFrom(acc1, account, 1, {"from": acc1})
+    assert [marketNFT.tokenByIndex(i) for i in range(4)] == [0, 1, 2, 3]
+
+    # the last token takes the place of the burned one
+    marketNFT.burn(1, {"from": account})
+    assert [marketNFT.tokenByIndex(i) for i in range(3)] == [0, 3, 2]
+
+    # fails because index >= totalSupply
+    with brownie.reverts("MarketNFT: Index out of range"):
+        marketNFT.tokenByIndex(3)
+
+
+def test_tokenOfOwnerByIndex(marketNFT):
+    account = get_account()
+    acc1 = get_account(index=1)
+    acc2 = get_account(index=2)
+    for i in range(4):
+        marketNFT.mint(acc1, {"from": account})
+    assert [marketNFT.tokenOfOwnerByIndex(acc1, i) for i in range(4)] == [0, 1, 2, 3]
+
+    # the last token of acc1 takes the place of the transfered one
+    marketNFT.transferFrom(acc1, acc2, 0, {"from": acc1})
+    marketNFT.transferFrom(acc1, acc2, 2, {"from": acc1})
+    assert [marketNFT.tokenOfOwnerByIndex(acc1, i) for i in range(2)] == [3, 1]
+    assert [marketNFT.tokenOfOwnerByIndex(acc2, i) for i in range(2)] == [0, 2]
+
+    marketNFT.burn(3, {"from": account})
+    assert marketNFT.tokenOfOwnerByIndex(acc1, 0) == 1
+
+    # fails because index >= balanceOf
+    with brownie.reverts("MarketNFT: Index out of range"):
+        marketNFT.tokenOfOwnerByIndex(acc1, 1)
+    with brownie.reverts("MarketNFT: ZERO_ADDRESS cannot own NFTs"):
+        marketNFT.tokenOfOwnerByIndex(ZERO_ADDRESS, 0)
+
+
 def test_supportsInterface(marketNFT):
 
     assert marketNFT.supportsInterface(0x80AC58CD)  # ERC721
     assert marketNFT.supportsInterface(0x5B5E139F) == False  # ERC721Metadata
-    assert marketNFT.supportsInterface(0x780E9D63) == False  # ERC721Enumerable
+    assert marketNFT.supportsInterface(0x780E9D63)  # ERC721Enumerable
     assert marketNFT.supportsInterface(0xFFFFFFFF) == False
@@ -7,12 +7,18 @@ from scripts.helpful_scripts import (
     CENT,
 )
 import brownie
-from brownie import Contract, MarketCoin, MarketNFT
+from brownie import Contract, MarketCoin, MarketNFT, accounts, chain
+from eth_keys import keys
+from eth_utils import keccak
 
 NAME = "NFT1"
 SYMBOL = "1"
 MINT_PRICE = POINT_ONE
 MARKETNFT_MINT_PRICE = POINT_ONE
+MAX_BATCH = 50
+MAX_BUNDLE_SIZE = 20
+EXPIRY = 2 ** 40
+NO_LISTING = 2 ** 256 - 1
 
 
 @pytest.fixture
@@ -24,6 +30,7 @@ def marketplace(NFTMarketPlace, MarketCoin):
     marketnft = MarketNFT.deploy(marketplace, MARKETNFT_MINT_PRICE, {"from": owner})
     marketplace.setMarketCoin(marketcoin, {"from": owner})
     marketplace.setMarketNFT(marketnft, {"from": owner})
+    marketplace.setMintPrice(MARKETNFT_MINT_PRICE, {"from": owner})
     marketcoin.setOwner(marketplace, {"from": owner})
     return marketplace
 
@@ -41,6 +48,40 @@ def NFT1(NFToken):
     return nftoken
 
 
+# A local account that can sign orders, owning the tokens 30, 31 and 32 of NFT1
+@pytest.fixture
+def signer(marketplace, NFT1):
+    account = get_account()
+    signer = accounts.add()
+    account.transfer(signer, ONE)
+    for i in range(3):
+        NFT1.mint({"value": MINT_PRICE, "from": signer})
+    NFT1.setApprovalForAll(marketplace, True, {"from": signer})
+    return signer
+
+
+def _word(value):
+    if isinstance(value, int):
+        return value.to_bytes(32, "big")
+    return bytes(12) + bytes.fromhex(str(value)[2:])
+
+
+# sign an EIP-712 Order of the marketplace with the private key of a local account
+def sign_order(marketplace, seller, nft, tokenId, price, expiry, nonce):
+    order_hash = keccak(
+        keccak(b"Order(address seller,address nft,uint256 tokenId,uint256 price,uint256 expiry,uint256 nonce)")
+        + _word(seller.address)
+        + _word(nft.address)
+        + _word(tokenId)
+        + _word(price)
+        + _word(expiry)
+        + _word(nonce)
+    )
+    digest = keccak(b"\x19\x01" + bytes(marketplace.DOMAIN_SEPARATOR()) + order_hash)
+    signature = keys.PrivateKey(bytes.fromhex(seller.private_key[2:])).sign_msg_hash(digest)
+    return signature.v + 27, _word(signature.r), _word(signature.s)
+
+
 def test_initial_totalSupply(NFT1):
     assert NFT1.totalSupply() == 30
 
@@ -70,6 +111,9 @@ def test_set_fee_revert(marketplace):
     # fails because marketplace not operator
     with brownie.reverts("MarketPlace: Only the owner can do that"):
         marketplace.setSellingFee(5, {"from": acc1})
+    # fails because the fee is more than 100%
+    with brownie.reverts("MarketPlace: Invalid fee"):
+        marketplace.setSellingFee(101, {"from": get_account(index=8)})
 
     assert marketplace.postingFee() == 0
     assert marketplace.sellingFee() == 0
@@ -89,10 +133,54 @@ def test_set_marketNFT(marketplace):
     account = get_account()
     owner = get_account(index=8)
 
-    marketNFT = MarketNFT.deploy(account, MARKETNFT_MINT_PRICE, {"from": account})
+    marketNFT = MarketNFT.deploy(account, 2 * MARKETNFT_MINT_PRICE, {"from": account})
     with brownie.reverts("MarketPlace: Only the owner can do that"):
         marketplace.setMarketNFT(marketNFT, {"from": account})
     marketplace.setMarketNFT(marketNFT, {"from": owner})
+    assert marketplace.marketNFT() == marketNFT
+    # the mint price is the one of the marketplace, not of the MarketNFT
+    assert marketplace.mintPrice() == MARKETNFT_MINT_PRICE
+
+
+def test_setMintPrice(marketplace):
+    account = get_account()
+    owner = get_account(index=8)
+
+    assert marketplace.mintPrice() == MARKETNFT_MINT_PRICE
+    with brownie.reverts("MarketPlace: Only the owner can do that"):
+        marketplace.setMintPrice(CENT, {"from": account})
+    marketplace.setMintPrice(CENT, {"from": owner})
+    assert marketplace.mintPrice() == CENT
+    # fails because the price doesn't fit in 96 bits
+    with brownie.reverts("MarketPlace: Invalid mint price"):
+        marketplace.setMintPrice(2 ** 96, {"from": owner})
+
+
+def test_config(marketplace):
+    owner = get_account(index=8)
+    marketCoin = marketplace.marketCoin()
+    marketNFT = marketplace.marketNFT()
+    assert marketplace.marketplace() == marketplace
+
+    # the fields packed in the same slot are set independently
+    marketplace.setSellingFee(100, {"from": owner})
+    marketplace.setAccrueRewards(True, {"from": owner})
+    marketplace.setArchiveListings(True, {"from": owner})
+    assert marketplace.marketCoin() == marketCoin
+    assert marketplace.sellingFee() == 100
+    assert marketplace.accrueRewards() == True
+    assert marketplace.archiveListings() == True
+
+    marketplace.setAccrueRewards(False, {"from": owner})
+    marketplace.setSellingFee(3, {"from": owner})
+    assert marketplace.marketCoin() == marketCoin
+    assert marketplace.sellingFee() == 3
+    assert marketplace.accrueRewards() == False
+    assert marketplace.archiveListings() == True
+
+    marketplace.setMintPrice(2 ** 96 - 1, {"from": owner})
+    assert marketplace.marketNFT() == marketNFT
+    assert marketplace.mintPrice() == 2 ** 96 - 1
 
 
 def test_sell(marketplace, NFT1):
@@ -118,6 +206,7 @@ def test_sell(marketplace, NFT1):
 
     # Test Event
     assert len(tx.events) == 1
+    assert tx.events[0]["_id"] == 0
     assert tx.events[0]["_seller"] == account
     assert tx.events[0]["_price"] == ONE * 42
     assert tx.events[0]["_nft"] == NFT1
@@ -159,6 +248,7 @@ def test_sell_approved(marketplace, NFT1):
 
     # Test Event
     assert len(tx.events) == 1
+    assert tx.events[0]["_id"] == 0
     assert tx.events[0]["_seller"] == acc3
     assert tx.events[0]["_price"] == ONE * 42
     assert tx.events[0]["_nft"] == NFT1
@@ -185,6 +275,70 @@ def test_sell_revert(marketplace, NFT1):
         marketplace.sell(NFT1, 0, ONE, {"from": account})
 
 
+def test_sellBatch(marketplace, NFT1):
+    account = get_account()
+    owner = get_account(index=8)
+    marketplace.setPostingFee(POINT_ONE, {"from": owner})
+    NFT1.setApprovalForAll(marketplace, True, {"from": account})
+
+    nfts = [NFT1.address] * 3 + [ZERO_ADDRESS] * (MAX_BATCH - 3)
+    tokenIds = [0, 1, 2] + [0] * (MAX_BATCH - 3)
+    prices = [ONE, ONE * 2, ONE * 3] + [0] * (MAX_BATCH - 3)
+    init_balance_account = account.balance()
+
+    tx = marketplace.sellBatch(
+        nfts, tokenIds, prices, 3, {"from": account, "value": POINT_ONE * 3}
+    )
+
+    assert tx.return_value[:4] == (0, 1, 2, 0)
+    assert marketplace.currentId() == 3
+    assert account.balance() == init_balance_account - POINT_ONE * 3
+    for i in range(3):
+        assert marketplace.idToListing(i) == (account, NFT1.address, i, prices[i], 1)
+
+    # Test Event
+    assert len(tx.events) == 3
+    assert tx.events[2]["_id"] == 2
+    assert tx.events[2]["_seller"] == account
+    assert tx.events[2]["_price"] == ONE * 3
+    assert tx.events[2]["_tokenId"] == 2
+
+
+def test_sellBatch_revert(marketplace, NFT1):
+    account = get_account()
+    owner = get_account(index=8)
+    nfts = [NFT1.address] * 2 + [ZERO_ADDRESS] * (MAX_BATCH - 2)
+    prices = [ONE] * MAX_BATCH
+
+    # fails because marketplace not operator
+    with brownie.reverts(
+        "MarketPlace: The marketplace doesn't have authorization to sell this token for this user"
+    ):
+        marketplace.sellBatch(nfts, [0] * MAX_BATCH, prices, 2, {"from": account})
+
+    NFT1.setApprovalForAll(marketplace, True, {"from": account})
+    # fails because account don't own the token #10
+    with brownie.reverts("MarketPlace: Only the approved of the token can sell it"):
+        marketplace.sellBatch(
+            nfts, [0, 10] + [0] * (MAX_BATCH - 2), prices, 2, {"from": account}
+        )
+
+    # fails because too many tokens
+    with brownie.reverts("MarketPlace: Batch too big"):
+        marketplace.sellBatch(nfts, [0] * MAX_BATCH, prices, MAX_BATCH + 1)
+
+    marketplace.setPostingFee(POINT_ONE, {"from": owner})
+    # fails because the postingFee is due for every token
+    with brownie.reverts("MarketPlace: Amount sent is below postingFee"):
+        marketplace.sellBatch(
+            nfts,
+            [0, 1] + [0] * (MAX_BATCH - 2),
+            prices,
+            2,
+            {"from": account, "value": POINT_ONE},
+        )
+
+
 def test_cancelSell(marketplace, NFT1):
     account = get_account()
 
@@ -194,10 +348,14 @@ def test_cancelSell(marketplace, NFT1):
     assert NFT1.ownerOf(0) == account
 
     # Cancel
-    marketplace.cancelSell(0, {"from": account})
+    tx = marketplace.cancelSell(0, {"from": account})
 
     assert marketplace.idToListing(0)[4] == 3
 
+    # Test Event: Cancelled
+    assert len(tx.events) == 1
+    assert tx.events["Cancelled"]["_id"] == 0
+
 
 def test_cancelSell_revert(marketplace, NFT1):
     account = get_account()
@@ -237,10 +395,9 @@ def test_updateSell(marketplace, NFT1):
 
     assert marketplace.idToListing(1)[3] == ONE * 2
 
-    # Test Event: Update Listing
+    # Test Event: Repriced
     assert len(tx.events) == 1
-    assert tx.events[0]["_id"] == 1
-    assert tx.events[0]["_listing"][3] == ONE * 2
+    assert tx.events["Repriced"].values() == [1, ONE * 2]
 
     # fails because value below price
     with brownie.reverts("MarketPlace: Not enough ether sent"):
@@ -273,6 +430,261 @@ def test_updateSell_revert(marketplace, NFT1):
         marketplace.updateSell(0, ONE * 2, {"from": account})
 
 
+def _packed(values):
+    return b"".join(_word(v) for v in values)
+
+
+def test_cancelSellBatch(marketplace, NFT1):
+    account = get_account()
+    NFT1.setApprovalForAll(marketplace, True)
+    for i in range(5):
+        marketplace.sell(NFT1.address, i, ONE, {"from": account})
+
+    tx = marketplace.cancelSellBatch(_packed([4, 1, 2]), {"from": account})
+    assert [marketplace.idToListing(i)[4] for i in range(5)] == [1, 3, 3, 1, 3]
+    assert marketplace.openListingCount() == 2
+    assert marketplace.activeListingOf(NFT1.address, 1) == 0
+
+    # Test Event: a single event for the batch
+    assert len(tx.events) == 1
+    assert tx.events["ListingsCancelled"]["_seller"] == account
+    assert tx.events["ListingsCancelled"]["_ids"] == "0x" + _packed([4, 1, 2]).hex()
+
+
+def test_cancelSellBatch_revert(marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+    NFT1.setApprovalForAll(marketplace, True)
+    for i in range(3):
+        marketplace.sell(NFT1.address, i, ONE, {"from": account})
+    marketplace.buy(2, {"from": acc1, "value": ONE})
+
+    # fails because only seller can cancel
+    with brownie.reverts("MarketPlace: Only the seller can cancel"):
+        marketplace.cancelSellBatch(_packed([0, 1]), {"from": acc1})
+    # fails because a token is already bought, nothing is cancelled
+    with brownie.reverts("MarketPlace: Token already sold"):
+        marketplace.cancelSellBatch(_packed([0, 2]), {"from": account})
+    assert marketplace.idToListing(0)[4] == 1
+    # fails because a listing is given twice
+    with brownie.reverts(
+        "MarketPlace: Token not for sale (already cancel or doesn't exist)"
+    ):
+        marketplace.cancelSellBatch(_packed([0, 0]), {"from": account})
+
+
+def test_updateSellBatch(marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+    NFT1.setApprovalForAll(marketplace, True)
+    for i in range(5):
+        marketplace.sell(NFT1.address, i, ONE, {"from": account})
+
+    tx = marketplace.updateSellBatch(
+        _packed([3, 0]), _packed([ONE * 2, POINT_ONE]), {"from": account}
+    )
+    assert [marketplace.idToListing(i)[3] for i in range(5)] == [
+        POINT_ONE,
+        ONE,
+        ONE,
+        ONE * 2,
+        ONE,
+    ]
+
+    # Test Event: a single event for the batch
+    assert len(tx.events) == 1
+    assert tx.events["ListingsRepriced"]["_seller"] == account
+    assert tx.events["ListingsRepriced"]["_ids"] == "0x" + _packed([3, 0]).hex()
+    assert (
+        tx.events["ListingsRepriced"]["_prices"]
+        == "0x" + _packed([ONE * 2, POINT_ONE]).hex()
+    )
+
+    # the new prices are used by buy
+    with brownie.reverts("MarketPlace: Not enough ether sent"):
+        marketplace.buy(3, {"from": acc1, "value": ONE})
+    marketplace.buy(3, {"from": acc1, "value": ONE * 2})
+
+
+def test_updateSellBatch_revert(marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+    NFT1.setApprovalForAll(marketplace, True)
+    for i in range(3):
+        marketplace.sell(NFT1.address, i, ONE, {"from": account})
+    marketplace.buy(2, {"from": acc1, "value": ONE})
+
+    # fails because there isn't a price for each listing
+    with brownie.reverts("MarketPlace: Invalid batch"):
+        marketplace.updateSellBatch(_packed([0, 1]), _packed([ONE * 2]), {"from": account})
+    # fails because not seller
+    with brownie.reverts("MarketPlace: Only the seller can update"):
+        marketplace.updateSellBatch(_packed([0]), _packed([ONE * 2]), {"from": acc1})
+    # fails because same price
+    with brownie.reverts("MarketPlace: The price need to be different"):
+        marketplace.updateSellBatch(
+            _packed([0, 1]), _packed([ONE * 2, ONE]), {"from": account}
+        )
+    # fails because not for sale, nothing is updated
+    with brownie.reverts(
+        "MarketPlace: Token not for sale (already sold, cancel or doesn't exist)"
+    ):
+        marketplace.updateSellBatch(
+            _packed([0, 2]), _packed([ONE * 2, ONE * 2]), {"from": account}
+        )
+    assert marketplace.idToListing(0)[3] == ONE
+
+
+def test_listing_large_price(marketplace, NFT1):
+    account = get_account()
+    NFT1.setApprovalForAll(marketplace, True)
+    # prices that don't fit in 96 bits are stored outside of the packed listing
+    large_price = 2 ** 200 + 1
+    marketplace.sell(NFT1.address, 3, large_price, {"from": account})
+    assert marketplace.idToListing(0) == (account, NFT1.address, 3, large_price, 1)
+
+    marketplace.updateSell(0, ONE, {"from": account})
+    assert marketplace.idToListing(0)[3] == ONE
+
+    marketplace.updateSell(0, 2 ** 96 - 1, {"from": account})
+    assert marketplace.idToListing(0)[3] == 2 ** 96 - 1
+
+    marketplace.cancelSell(0, {"from": account})
+    assert marketplace.idToListing(0) == (account, NFT1.address, 3, 2 ** 96 - 1, 3)
+
+
+def test_open_listings(marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+    NFT1.setApprovalForAll(marketplace, True)
+    for i in range(5):
+        marketplace.sell(NFT1.address, i, ONE, {"from": account})
+    assert marketplace.openListingCount() == 5
+    assert [marketplace.openListingAt(i) for i in range(5)] == [0, 1, 2, 3, 4]
+
+    # the last OPEN listing takes the place of the removed one
+    marketplace.cancelSell(1, {"from": account})
+    assert marketplace.openListingCount() == 4
+    assert [marketplace.openListingAt(i) for i in range(4)] == [0, 4, 2, 3]
+
+    marketplace.buy(3, {"from": acc1, "value": ONE})
+    assert marketplace.openListingCount() == 3
+    assert [marketplace.openListingAt(i) for i in range(3)] == [0, 4, 2]
+
+    # updating the price doesn't change the OPEN listings
+    marketplace.updateSell(0, ONE * 2, {"from": account})
+    assert marketplace.openListingCount() == 3
+
+    marketplace.buy(0, {"from": acc1, "value": ONE * 2})
+    marketplace.cancelSell(4, {"from": account})
+    marketplace.cancelSell(2, {"from": account})
+    assert marketplace.openListingCount() == 0
+
+    # fails because there is no OPEN listing left
+    with brownie.reverts("MarketPlace: Index out of range"):
+        marketplace.openListingAt(0)
+
+
+def test_nft_and_seller_listings(marketplace, NFT1, NFToken):
+    account = get_account()
+    acc1 = get_account(index=1)
+    acc2 = get_account(index=2)
+    NFT2 = NFToken.deploy("NFT2", "2", MINT_PRICE, {"from": account})
+    NFT2.mint({"value": MINT_PRICE, "from": account})
+
+    NFT1.setApprovalForAll(marketplace, True, {"from": account})
+    NFT1.setApprovalForAll(marketplace, True, {"from": acc1})
+    NFT2.setApprovalForAll(marketplace, True, {"from": account})
+    marketplace.sell(NFT1.address, 0, ONE, {"from": account})
+    marketplace.sell(NFT2.address, 0, ONE, {"from": account})
+    marketplace.sell(NFT1.address, 10, ONE, {"from": acc1})
+    marketplace.sell(NFT1.address, 1, ONE, {"from": account})
+
+    # OPEN listings by nft
+    assert marketplace.nftOpenListingCount(NFT1) == 3
+    assert [marketplace.nftOpenListings(NFT1, i) for i in range(3)] == [0, 2, 3]
+    assert marketplace.nftOpenListingCount(NFT2) == 1
+    assert marketplace.nftOpenListings(NFT2, 0) == 1
+
+    # listings by seller
+    assert marketplace.sellerListingCount(account) == 3
+    assert [marketplace.sellerListings(account, i) for i in range(3)] == [0, 1, 3]
+    assert marketplace.sellerListingCount(acc1) == 1
+    assert marketplace.sellerListings(acc1, 0) == 2
+
+    marketplace.buy(0, {"from": acc2, "value": ONE})
+    marketplace.cancelSell(1, {"from": account})
+
+    # closed listings leave the nft index but stay in the seller index
+    assert marketplace.nftOpenListingCount(NFT1) == 2
+    assert [marketplace.nftOpenListings(NFT1, i) for i in range(2)] == [3, 2]
+    assert marketplace.nftOpenListingCount(NFT2) == 0
+    assert marketplace.sellerListingCount(account) == 3
+    assert marketplace.openListingCount() == 2
+    assert [marketplace.openListingAt(i) for i in range(2)] == [3, 2]
+
+
+def test_relist(marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+    NFT1.setApprovalForAll(marketplace, True)
+    marketplace.sell(NFT1.address, 0, ONE, {"from": account})
+    assert marketplace.activeListingOf(NFT1, 0) == 0
+
+    # listing the same token again cancels the previous listing
+    tx = marketplace.sell(NFT1.address, 0, ONE * 2, {"from": account})
+    assert marketplace.activeListingOf(NFT1, 0) == 1
+    assert marketplace.idToListing(0)[4] == 3
+    assert marketplace.openListingCount() == 1
+    assert tx.events["Cancelled"]["_id"] == 0
+
+    marketplace.buy(1, {"from": acc1, "value": ONE * 2})
+    # fails because the token has no OPEN listing anymore
+    with brownie.reverts("MarketPlace: No active listing"):
+        marketplace.activeListingOf(NFT1, 0)
+
+
+def test_isListingValid(marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+    NFT1.setApprovalForAll(marketplace, True)
+    marketplace.sell(NFT1.address, 0, ONE, {"from": account})
+    marketplace.sell(NFT1.address, 1, ONE, {"from": account})
+    assert marketplace.isListingValid(0) == True
+    # listing doesn't exist
+    assert marketplace.isListingValid(2) == False
+
+    # seller no longer owns the token
+    NFT1.transferFrom(account, acc1, 0, {"from": account})
+    assert marketplace.isListingValid(0) == False
+    NFT1.transferFrom(acc1, account, 0, {"from": acc1})
+    assert marketplace.isListingValid(0) == True
+
+    # marketplace no longer operator, but approved for token #1
+    NFT1.setApprovalForAll(marketplace, False)
+    assert marketplace.isListingValid(0) == False
+    NFT1.approve(marketplace, 1, {"from": account})
+    assert marketplace.isListingValid(1) == True
+
+    # listing canceled
+    marketplace.cancelSell(1, {"from": account})
+    assert marketplace.isListingValid(1) == False
+
+
+def test_isListingValid_burned(marketplace):
+    account = get_account()
+    marketNFT = MarketNFT.deploy(account, MARKETNFT_MINT_PRICE, {"from": account})
+    marketNFT.mintBatch(account, 2, {"from": account})
+    marketNFT.setApprovalForAll(marketplace, True, {"from": account})
+    marketplace.sell(marketNFT, 0, ONE, {"from": account})
+    marketplace.sell(marketNFT, 1, ONE, {"from": account})
+
+    # ownerOf reverts for a burned token, the listing is just not valid
+    marketNFT.burn(0, {"from": account})
+    assert marketplace.isListingValid(0) == False
+    assert marketplace.isListingValid(1) == True
+
+
 def test_buy(marketplace, NFT1):
     account = get_account()
     acc1 = get_account(index=1)
@@ -297,32 +709,30 @@ def test_buy(marketplace, NFT1):
     assert NFT1.ownerOf(0) == acc1
 
     # Test Event
-    assert len(tx.events) == 5
-    ## Transfer of NFT
-    assert tx.events[0]["_from"] == account
-    assert tx.events[0]["_to"] == acc1
+    assert len(tx.events) == 4
+    ## Sale, before the external calls
+    assert tx.events[0].name == "Sale"
+    assert tx.events[0]["_id"] == 0
+    assert tx.events[0]["_seller"] == account
+    assert tx.events[0]["_buyer"] == acc1
+    assert tx.events[0]["_price"] == ONE
+    assert tx.events[0]["_nft"] == NFT1
     assert tx.events[0]["_tokenId"] == 0
 
-    ## Test Transfer Event - Mint MarketCoin to seller
-    assert tx.events[1]["_from"] == ZERO_ADDRESS
-    assert tx.events[1]["_to"] == account
-    assert tx.events[1]["_value"] == ONE / 10
+    ## Transfer of NFT
+    assert tx.events[1]["_from"] == account
+    assert tx.events[1]["_to"] == acc1
+    assert tx.events[1]["_tokenId"] == 0
 
-    ## Test Transfer Event - Mint MarketCoin to buyer
+    ## Test Transfer Event - Mint MarketCoin to seller
     assert tx.events[2]["_from"] == ZERO_ADDRESS
-    assert tx.events[2]["_to"] == acc1
+    assert tx.events[2]["_to"] == account
     assert tx.events[2]["_value"] == ONE / 10
 
-    ## Update Listing
-    assert tx.events[3]["_id"] == 0
-    assert tx.events[3]["_listing"][4] == 2
-
-    ## Sale
-    assert tx.events[4]["_seller"] == account
-    assert tx.events[4]["_buyer"] == acc1
-    assert tx.events[4]["_price"] == ONE
-    assert tx.events[4]["_nft"] == NFT1
-    assert tx.events[4]["_tokenId"] == 0
+    ## Test Transfer Event - Mint MarketCoin to buyer
+    assert tx.events[3]["_from"] == ZERO_ADDRESS
+    assert tx.events[3]["_to"] == acc1
+    assert tx.events[3]["_value"] == ONE / 10
 
 
 def test_buy_seller(marketplace, NFT1):
@@ -346,32 +756,30 @@ def test_buy_seller(marketplace, NFT1):
     assert NFT1.ownerOf(0) == account
 
     # Test Event
-    assert len(tx.events) == 5
-    ## Transfer of NFT
-    assert tx.events[0]["_from"] == account
-    assert tx.events[0]["_to"] == account
+    assert len(tx.events) == 4
+    ## Sale, before the external calls
+    assert tx.events[0].name == "Sale"
+    assert tx.events[0]["_id"] == 0
+    assert tx.events[0]["_seller"] == account
+    assert tx.events[0]["_buyer"] == account
+    assert tx.events[0]["_price"] == ONE
+    assert tx.events[0]["_nft"] == NFT1
     assert tx.events[0]["_tokenId"] == 0
 
-    ## Test Transfer Event - Mint MarketCoin to seller
-    assert tx.events[1]["_from"] == ZERO_ADDRESS
+    ## Transfer of NFT
+    assert tx.events[1]["_from"] == account
     assert tx.events[1]["_to"] == account
-    assert tx.events[1]["_value"] == ONE / 10
+    assert tx.events[1]["_tokenId"] == 0
 
-    ## Test Transfer Event - Mint MarketCoin to buyer
+    ## Test Transfer Event - Mint MarketCoin to seller
     assert tx.events[2]["_from"] == ZERO_ADDRESS
     assert tx.events[2]["_to"] == account
     assert tx.events[2]["_value"] == ONE / 10
 
-    ## Update Listing
-    assert tx.events[3]["_id"] == 0
-    assert tx.events[3]["_listing"][4] == 2
-
-    ## Sale
-    assert tx.events[4]["_seller"] == account
-    assert tx.events[4]["_buyer"] == account
-    assert tx.events[4]["_price"] == ONE
-    assert tx.events[4]["_nft"] == NFT1
-    assert tx.events[4]["_tokenId"] == 0
+    ## Test Transfer Event - Mint MarketCoin to buyer
+    assert tx.events[3]["_from"] == ZERO_ADDRESS
+    assert tx.events[3]["_to"] == account
+    assert tx.events[3]["_value"] == ONE / 10
 
 
 def test_buy_already_transfered(marketplace, NFT1):
@@ -434,6 +842,224 @@ def test_buy_revert(marketplace, NFT1):
     marketplace.buy(2, {"from": account, "value": ONE})
 
 
+def test_buy_refund(marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+    owner = get_account(index=8)
+    marketplace.setSellingFee(1, {"from": owner})
+    NFT1.setApprovalForAll(marketplace, True)
+    marketplace.sell(NFT1.address, 0, ONE, {"from": account})
+
+    init_balance_account = account.balance()
+    init_balance_acc1 = acc1.balance()
+
+    # Buy, sending too much ether
+    tx = marketplace.buy(0, {"from": acc1, "value": ONE * 3})
+
+    assert tx.return_value == 0
+    # Money, the excess is refunded and only the fee is kept
+    assert acc1.balance() == init_balance_acc1 - ONE
+    assert account.balance() == init_balance_account + ONE * 99 / 100
+    assert marketplace.balance() == ONE / 100
+    assert NFT1.ownerOf(0) == acc1
+
+
+def test_buy_reentrant_cancel(marketplace, NFT1, ReentrantNFT):
+    account = get_account()
+    acc1 = get_account(index=1)
+    NFT1.setApprovalForAll(marketplace, True)
+    for i in range(3):
+        marketplace.sell(NFT1.address, i, ONE, {"from": account})
+    nft = ReentrantNFT.deploy(marketplace, {"from": account})
+    nft.sell(0, ONE, {"from": account})
+    nft.sell(1, ONE, {"from": account})
+
+    # the nft tries to cancel listing 4 while it is bought, the listing is
+    # already SOLD so the cancel fails and it is removed only once
+    marketplace.buy(4, {"from": acc1, "value": ONE})
+    assert nft.ownerOf(1) == acc1
+    assert marketplace.idToListing(4)[4] == 2
+    assert marketplace.openListingCount() == 4
+    assert [marketplace.openListingAt(i) for i in range(4)] == [0, 1, 2, 3]
+    assert marketplace.nftOpenListingCount(nft) == 1
+
+    # the other listings can still be bought
+    for i in range(4):
+        marketplace.buy(i, {"from": acc1, "value": ONE})
+    assert marketplace.openListingCount() == 0
+
+
+def test_buyBatch(marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+    acc3 = get_account(index=3)
+    owner = get_account(index=8)
+    marketplace.setSellingFee(1, {"from": owner})
+
+    # Sell
+    NFT1.setApprovalForAll(marketplace, True, {"from": account})
+    NFT1.setApprovalForAll(marketplace, True, {"from": acc1})
+    marketplace.sell(NFT1.address, 0, ONE, {"from": account})
+    marketplace.sell(NFT1.address, 10, ONE, {"from": acc1})
+    marketplace.sell(NFT1.address, 1, ONE * 2, {"from": account})
+
+    marketCoin = Contract.from_abi(
+        MarketCoin._name, marketplace.marketCoin(), MarketCoin.abi
+    )
+    init_balance_account = account.balance()
+    init_balance_acc1 = acc1.balance()
+    init_balance_acc3 = acc3.balance()
+
+    # Buy, sending too much ether
+    ids = [0, 1, 2] + [0] * (MAX_BATCH - 3)
+    tx = marketplace.buyBatch(ids, 3, {"from": acc3, "value": ONE * 10})
+
+    assert tx.return_value == ONE * 4
+    # Money, the excess is refunded
+    assert acc3.balance() == init_balance_acc3 - ONE * 4
+    assert account.balance() == init_balance_account + (ONE * 3) * 99 / 100
+    assert acc1.balance() == init_balance_acc1 + ONE * 99 / 100
+    assert marketplace.balance() == ONE * 4 / 100
+    # Ownership
+    for tokenId in [0, 1, 10]:
+        assert NFT1.ownerOf(tokenId) == acc3
+    for id in range(3):
+        assert marketplace.idToListing(id)[4] == 2
+    # MarketCoin rewards
+    assert marketCoin.balanceOf(acc3) == ONE * 4 / 10
+    assert marketCoin.balanceOf(account) == ONE * 3 / 10
+    assert marketCoin.balanceOf(acc1) == ONE / 10
+
+    # Test Event: one mint per seller and one for the buyer
+    assert [e["_id"] for e in tx.events["Sale"]] == [0, 1, 2]
+    assert len(tx.events["Transfer"]) == 3 + 3
+
+
+def test_buyBatch_revert(marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+    NFT1.setApprovalForAll(marketplace, True)
+    marketplace.sell(NFT1.address, 0, ONE, {"from": account})
+    marketplace.sell(NFT1.address, 1, ONE, {"from": account})
+
+    # fails because value below the total price
+    with brownie.reverts("MarketPlace: Not enough ether sent"):
+        marketplace.buyBatch(
+            [0, 1] + [0] * (MAX_BATCH - 2), 2, {"from": acc1, "value": ONE}
+        )
+
+    # fails because the same listing is bought twice
+    with brownie.reverts("MarketPlace: Token no longer for sale"):
+        marketplace.buyBatch(
+            [0, 0] + [0] * (MAX_BATCH - 2), 2, {"from": acc1, "value": ONE * 2}
+        )
+
+    # fails because listing doesn't exist
+    with brownie.reverts("MarketPlace: Listing doesn't exist"):
+        marketplace.buyBatch(
+            [0, 2] + [0] * (MAX_BATCH - 2), 2, {"from": acc1, "value": ONE * 2}
+        )
+
+    # fails because too many listings
+    with brownie.reverts("MarketPlace: Batch too big"):
+        marketplace.buyBatch([0] * MAX_BATCH, MAX_BATCH + 1, {"from": acc1})
+
+
+def test_bid(marketplace, NFT1):
+    account = get_account()
+    acc3 = get_account(index=3)
+    acc4 = get_account(index=4)
+    owner = get_account(index=8)
+    marketplace.setSellingFee(1, {"from": owner})
+
+    # Sell
+    NFT1.setApprovalForAll(marketplace, True)
+    marketplace.sell(NFT1.address, 0, ONE * 10, {"from": account})
+    init_balance_account = account.balance()
+    init_balance_acc3 = acc3.balance()
+    init_balance_acc4 = acc4.balance()
+
+    # Bid
+    tx = marketplace.placeBid(0, {"from": acc3, "value": ONE})
+    assert tx.return_value == 1
+    assert tx.events["BidEvent"]["_listing"] == 0
+    assert tx.events["BidEvent"]["_bidder"] == acc3
+    assert tx.events["BidEvent"]["_bid"] == ONE
+    assert marketplace.bestBid(0) == (acc3, ONE)
+
+    # Outbid, the bid of acc3 goes to its refund balance
+    marketplace.placeBid(0, {"from": acc4, "value": ONE * 2})
+    assert marketplace.bestBid(0) == (acc4, ONE * 2)
+    assert marketplace.listingToBidNumber(0) == 2
+    assert marketplace.bidRefunds(acc3) == ONE
+
+    # Accept
+    tx = marketplace.acceptBid(0, {"from": account})
+    assert NFT1.ownerOf(0) == acc4
+    assert marketplace.idToListing(0)[4] == 2
+    assert marketplace.bestBid(0) == (ZERO_ADDRESS, 0)
+    assert tx.events["Sale"]["_buyer"] == acc4
+    assert tx.events["Sale"]["_price"] == ONE * 2
+
+    # Money
+    assert account.balance() == init_balance_account + ONE * 2 * 99 / 100
+    assert acc4.balance() == init_balance_acc4 - ONE * 2
+    marketplace.withdrawRefund({"from": acc3})
+    assert marketplace.bidRefunds(acc3) == 0
+    assert acc3.balance() == init_balance_acc3
+    assert marketplace.balance() == ONE * 2 / 100
+
+
+def test_bid_revert(marketplace, NFT1):
+    account = get_account()
+    acc3 = get_account(index=3)
+    acc4 = get_account(index=4)
+
+    # fails because listing doesn't exist
+    with brownie.reverts("MarketPlace: Listing doesn't exist"):
+        marketplace.placeBid(0, {"from": acc3, "value": ONE})
+
+    NFT1.setApprovalForAll(marketplace, True)
+    marketplace.sell(NFT1.address, 0, ONE * 10, {"from": account})
+
+    # fails because there is no bid
+    with brownie.reverts("MarketPlace: No bid to accept"):
+        marketplace.acceptBid(0, {"from": account})
+
+    marketplace.placeBid(0, {"from": acc3, "value": ONE})
+    # fails because the bid isn't higher than the best bid
+    with brownie.reverts("MarketPlace: Bid too low"):
+        marketplace.placeBid(0, {"from": acc4, "value": ONE})
+
+    # fails because only the seller can accept
+    with brownie.reverts("MarketPlace: Only the seller can accept a bid"):
+        marketplace.acceptBid(0, {"from": acc3})
+
+    # fails because only the best bidder can withdraw
+    with brownie.reverts("MarketPlace: Only the best bidder can withdraw"):
+        marketplace.withdrawBid(0, {"from": acc4})
+
+    # fails because nothing to refund
+    with brownie.reverts("MarketPlace: Nothing to refund"):
+        marketplace.withdrawRefund({"from": acc3})
+
+    init_balance_acc3 = acc3.balance()
+    marketplace.withdrawBid(0, {"from": acc3})
+    assert acc3.balance() == init_balance_acc3 + ONE
+    assert marketplace.bestBid(0) == (ZERO_ADDRESS, 0)
+
+    # fails because the bid has been withdrawn
+    with brownie.reverts("MarketPlace: No bid to withdraw"):
+        marketplace.withdrawBid(0, {"from": acc3})
+    with brownie.reverts("MarketPlace: No bid to accept"):
+        marketplace.acceptBid(0, {"from": account})
+
+    marketplace.cancelSell(0, {"from": account})
+    # fails because listing canceled
+    with brownie.reverts("MarketPlace: Token no longer for sale"):
+        marketplace.placeBid(0, {"from": acc3, "value": ONE})
+
+
 # should be possible, we still take the posting fee
 def test_price_of_zero(marketplace, NFT1):
     account = get_account()
@@ -564,6 +1190,441 @@ def test_marketcoin_balance(marketplace, NFT1):
     assert marketCoin.balanceOf(acc2) == init_balance_acc2 + priceNFT / 10
 
 
+def test_bundle(marketplace, NFT1, NFToken):
+    account = get_account()
+    acc1 = get_account(index=1)
+    NFT2 = NFToken.deploy("NFT2", "2", MINT_PRICE, {"from": account})
+    NFT2.mint({"value": MINT_PRICE, "from": account})
+    NFT1.setApprovalForAll(marketplace, True, {"from": account})
+    NFT2.setApprovalForAll(marketplace, True, {"from": account})
+    marketplace.sell(NFT1, 1, ONE, {"from": account})
+
+    nfts = [NFT1, NFT1, NFT2] + [ZERO_ADDRESS] * (MAX_BUNDLE_SIZE - 3)
+    tokenIds = [0, 1, 0] + [0] * (MAX_BUNDLE_SIZE - 3)
+    tx = marketplace.sellBundle(nfts, tokenIds, 3, 2 * ONE, {"from": account})
+    bundleId = tx.return_value
+    assert bundleId == 0
+    assert marketplace.bundleCount() == 1
+    assert marketplace.bundles(bundleId) == (account, 2 * ONE, 3, 1)
+    assert marketplace.bundleNfts(bundleId, 2) == NFT2
+    assert marketplace.bundleTokenIds(bundleId, 1) == 1
+    assert tx.events["BundleUpdated"][0]["_status"] == 1
+
+    # all the tokens are transfered in one buy, the seller is paid once and
+    # the excess is refunded
+    init_balance_account = account.balance()
+    init_balance_acc1 = acc1.balance()
+    tx = marketplace.buyBundle(bundleId, {"from": acc1, "value": 3 * ONE})
+
+    assert NFT1.ownerOf(0) == NFT1.ownerOf(1) == NFT2.ownerOf(0) == acc1
+    assert account.balance() == init_balance_account + 2 * ONE
+    assert acc1.balance() == init_balance_acc1 - 2 * ONE
+    assert marketplace.bundles(bundleId)[3] == 2
+    # the OPEN listing of token 1 is cancelled
+    assert marketplace.idToListing(0)[4] == 3
+
+    marketCoin = Contract.from_abi(MarketCoin._name, marketplace.marketCoin(), MarketCoin.abi)
+    assert marketCoin.balanceOf(account) == marketCoin.balanceOf(acc1) == 2 * ONE / 10
+
+    # Test Event
+    assert len(tx.events["BundleSale"]) == 1
+    assert tx.events["BundleSale"][0]["_seller"] == account
+    assert tx.events["BundleSale"][0]["_buyer"] == acc1
+    assert tx.events["BundleSale"][0]["_price"] == 2 * ONE
+
+
+def test_bundle_revert(marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+    NFT1.setApprovalForAll(marketplace, True, {"from": account})
+    nfts = [NFT1] * MAX_BUNDLE_SIZE
+    tokenIds = list(range(MAX_BUNDLE_SIZE))
+
+    with brownie.reverts("MarketPlace: Invalid bundle size"):
+        marketplace.sellBundle(nfts, tokenIds, 0, ONE, {"from": account})
+    with brownie.reverts("MarketPlace: Invalid bundle size"):
+        marketplace.sellBundle(nfts, tokenIds, MAX_BUNDLE_SIZE + 1, ONE, {"from": account})
+    # fails because token 10 belongs to acc1
+    with brownie.reverts("MarketPlace: Only the approved of the token can sell it"):
+        marketplace.sellBundle(nfts, tokenIds, 11, ONE, {"from": account})
+
+    marketplace.sellBundle(nfts, tokenIds, 2, ONE, {"from": account})
+    with brownie.reverts("MarketPlace: Not enough ether sent"):
+        marketplace.buyBundle(0, {"from": acc1, "value": ONE - 1})
+    with brownie.reverts("MarketPlace: Bundle doesn't exist"):
+        marketplace.buyBundle(1, {"from": acc1, "value": ONE})
+    with brownie.reverts("MarketPlace: Only the seller can cancel"):
+        marketplace.cancelBundle(0, {"from": acc1})
+
+    marketplace.cancelBundle(0, {"from": account})
+    assert marketplace.bundles(0)[3] == 3
+    with brownie.reverts("MarketPlace: Bundle no longer for sale"):
+        marketplace.buyBundle(0, {"from": acc1, "value": ONE})
+    with brownie.reverts("MarketPlace: Bundle not for sale (already sold or cancel)"):
+        marketplace.cancelBundle(0, {"from": account})
+
+
+def test_collection_offer(marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+    acc2 = get_account(index=2)
+    NFT1.setApprovalForAll(marketplace, True, {"from": account})
+    NFT1.setApprovalForAll(marketplace, True, {"from": acc1})
+
+    tx = marketplace.makeCollectionOffer(NFT1, ONE, 3, {"from": acc2, "value": 3 * ONE})
+    offerId = tx.return_value
+    assert offerId == 0
+    assert marketplace.offerCount() == 1
+    assert marketplace.offers(offerId) == (acc2, NFT1.address, ONE, 3)
+    assert tx.events["OfferUpdated"][0]["_quantity"] == 3
+
+    # any holder can fill the offer, an OPEN listing of the token is cancelled
+    marketplace.sell(NFT1, 1, 5 * ONE, {"from": account})
+    init_balance_account = account.balance()
+    marketplace.acceptCollectionOffer(offerId, 0, {"from": account})
+    marketplace.acceptCollectionOffer(offerId, 1, {"from": account})
+    tx = marketplace.acceptCollectionOffer(offerId, 10, {"from": acc1})
+
+    assert NFT1.ownerOf(0) == NFT1.ownerOf(1) == NFT1.ownerOf(10) == acc2
+    assert account.balance() == init_balance_account + 2 * ONE
+    assert marketplace.idToListing(0)[4] == 3
+    assert marketplace.offers(offerId)[3] == 0
+
+    # Test Event
+    assert tx.events["OfferUpdated"][0]["_quantity"] == 0
+    assert tx.events["Sale"][0]["_id"] == NO_LISTING
+    assert tx.events["Sale"][0]["_seller"] == acc1
+    assert tx.events["Sale"][0]["_buyer"] == acc2
+    assert tx.events["Sale"][0]["_price"] == ONE
+    assert tx.events["Sale"][0]["_tokenId"] == 10
+
+
+def test_collection_offer_revert(marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+    acc2 = get_account(index=2)
+    NFT1.setApprovalForAll(marketplace, True, {"from": account})
+
+    # fails because the ether sent doesn't cover the offer
+    with brownie.reverts("MarketPlace: Amount sent must be price * quantity"):
+        marketplace.makeCollectionOffer(NFT1, ONE, 2, {"from": acc2, "value": ONE})
+    with brownie.reverts("MarketPlace: Quantity must be positive"):
+        marketplace.makeCollectionOffer(NFT1, ONE, 0, {"from": acc2})
+
+    marketplace.makeCollectionOffer(NFT1, ONE, 1, {"from": acc2, "value": ONE})
+    # fails because acc1 isn't approved for token 0
+    with brownie.reverts("MarketPlace: Only the approved of the token can sell it"):
+        marketplace.acceptCollectionOffer(0, 0, {"from": acc1})
+    marketplace.acceptCollectionOffer(0, 0, {"from": account})
+    # fails because the offer is filled
+    with brownie.reverts("MarketPlace: Offer not active"):
+        marketplace.acceptCollectionOffer(0, 1, {"from": account})
+    with brownie.reverts("MarketPlace: Offer not active"):
+        marketplace.acceptCollectionOffer(1, 1, {"from": account})
+
+
+def test_cancelCollectionOffer(marketplace, NFT1):
+    account = get_account()
+    acc2 = get_account(index=2)
+    NFT1.setApprovalForAll(marketplace, True, {"from": account})
+    marketplace.makeCollectionOffer(NFT1, ONE, 3, {"from": acc2, "value": 3 * ONE})
+    marketplace.acceptCollectionOffer(0, 0, {"from": account})
+
+    # fails because only the buyer can cancel
+    with brownie.reverts("MarketPlace: Only the buyer can cancel an offer"):
+        marketplace.cancelCollectionOffer(0, {"from": account})
+
+    # the ether of the 2 tokens not bought is sent back
+    init_balance_acc2 = acc2.balance()
+    tx = marketplace.cancelCollectionOffer(0, {"from": acc2})
+    assert tx.return_value == 2 * ONE
+    assert acc2.balance() == init_balance_acc2 + 2 * ONE
+    assert marketplace.offers(0)[3] == 0
+
+    with brownie.reverts("MarketPlace: Offer not active"):
+        marketplace.cancelCollectionOffer(0, {"from": acc2})
+    with brownie.reverts("MarketPlace: Offer not active"):
+        marketplace.acceptCollectionOffer(0, 1, {"from": account})
+
+
+def test_accrue_rewards(marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+    owner = get_account(index=8)
+
+    with brownie.reverts("MarketPlace: Only the owner can do that"):
+        marketplace.setAccrueRewards(True, {"from": account})
+    marketplace.setAccrueRewards(True, {"from": owner})
+    assert marketplace.accrueRewards() == True
+
+    marketCoin = Contract.from_abi(
+        MarketCoin._name, marketplace.marketCoin(), MarketCoin.abi
+    )
+
+    # Sell and Buy
+    NFT1.setApprovalForAll(marketplace, True)
+    marketplace.sell(NFT1.address, 0, ONE, {"from": account})
+    marketplace.sell(NFT1.address, 1, ONE, {"from": account})
+    tx = marketplace.buy(0, {"from": acc1, "value": ONE})
+    marketplace.buy(1, {"from": acc1, "value": ONE})
+
+    # no MarketCoin minted during the sale, only the NFT is transfered
+    assert len(tx.events["Transfer"]) == 1
+    assert marketCoin.balanceOf(account) == 0
+    assert marketplace.rewards(account) == 2 * ONE / 10
+    assert marketplace.rewards(acc1) == 2 * ONE / 10
+
+    # Claim
+    tx = marketplace.claimRewards({"from": account})
+    assert tx.return_value == 2 * ONE / 10
+    assert marketplace.rewards(account) == 0
+    assert marketCoin.balanceOf(account) == 2 * ONE / 10
+
+    # fails because nothing left to claim
+    with brownie.reverts("MarketPlace: No rewards to claim"):
+        marketplace.claimRewards({"from": account})
+
+    # claimed MarketCoin can be used to mint a MarketNFT
+    marketplace.mintMarketNFT({"from": account})
+    assert marketCoin.balanceOf(account) == 2 * ONE / 10 - MARKETNFT_MINT_PRICE
+
+
+def test_escrow_proceeds(marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+    owner = get_account(index=8)
+
+    with brownie.reverts("MarketPlace: Only the owner can do that"):
+        marketplace.setEscrowProceeds(True, {"from": account})
+    marketplace.setEscrowProceeds(True, {"from": owner})
+    marketplace.setSellingFee(10, {"from": owner})
+    assert marketplace.escrowProceeds() == True
+
+    NFT1.setApprovalForAll(marketplace, True)
+    for i in range(4):
+        marketplace.sell(NFT1.address, i, ONE, {"from": account})
+
+    # the seller is credited instead of paid
+    init_balance_account = account.balance()
+    marketplace.buy(0, {"from": acc1, "value": ONE})
+    marketplace.buyBatch([1, 2] + [0] * (MAX_BATCH - 2), 2, {"from": acc1, "value": 2 * ONE})
+    assert account.balance() == init_balance_account
+    assert marketplace.proceeds(account) == 3 * ONE * 9 / 10
+    assert marketplace.balance() == 3 * ONE
+
+    # the owner can only withdraw the fees, not the escrowed proceeds
+    with brownie.reverts("MarketPlace: Amount above the fees earned"):
+        marketplace.withdraw(3 * ONE, {"from": owner})
+    marketplace.withdraw(3 * ONE / 10, {"from": owner})
+    with brownie.reverts("MarketPlace: Amount above the fees earned"):
+        marketplace.withdraw(1, {"from": owner})
+    assert marketplace.balance() == 3 * ONE * 9 / 10
+
+    # one transfer for all the sales
+    tx = marketplace.withdrawProceeds({"from": account})
+    assert tx.return_value == 3 * ONE * 9 / 10
+    assert account.balance() == init_balance_account + 3 * ONE * 9 / 10
+    assert marketplace.proceeds(account) == 0
+
+    # fails because nothing left to withdraw
+    with brownie.reverts("MarketPlace: No proceeds to withdraw"):
+        marketplace.withdrawProceeds({"from": account})
+
+    # sellers are paid directly once the mode is turned off
+    marketplace.setEscrowProceeds(False, {"from": owner})
+    marketplace.buy(3, {"from": acc1, "value": ONE})
+    assert marketplace.proceeds(account) == 0
+    assert account.balance() == init_balance_account + 4 * ONE * 9 / 10
+
+
+def test_stats(marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+    owner = get_account(index=8)
+    marketplace.setSellingFee(10, {"from": owner})
+    assert marketplace.getStats(NFT1) == (0, 0, 0, 0, 0, 0)
+
+    NFT1.setApprovalForAll(marketplace, True)
+    for i in range(3):
+        marketplace.sell(NFT1.address, i, ONE, {"from": account})
+    marketplace.buy(0, {"from": acc1, "value": ONE})
+    marketplace.buyBatch([1, 2] + [0] * (MAX_BATCH - 2), 2, {"from": acc1, "value": 2 * ONE})
+    assert marketplace.getStats(NFT1) == (3 * ONE, 3, 3 * ONE / 10, 0, 3 * ONE, 3)
+
+    # a bundle is one sale of the collection ZERO_ADDRESS
+    nfts = [NFT1, NFT1] + [ZERO_ADDRESS] * (MAX_BUNDLE_SIZE - 2)
+    tokenIds = [3, 4] + [0] * (MAX_BUNDLE_SIZE - 2)
+    marketplace.sellBundle(nfts, tokenIds, 2, 2 * ONE, {"from": account})
+    marketplace.buyBundle(0, {"from": acc1, "value": 2 * ONE})
+    assert marketplace.getStats(NFT1) == (5 * ONE, 4, 5 * ONE / 10, 0, 3 * ONE, 3)
+    assert marketplace.getStats(ZERO_ADDRESS)[4:] == (2 * ONE, 1)
+
+    marketplace.withdraw(POINT_ONE, {"from": owner})
+    assert marketplace.getStats(NFT1)[3] == POINT_ONE
+
+    # posting fees are earned too
+    marketplace.setPostingFee(CENT, {"from": owner})
+    marketplace.sell(NFT1.address, 5, ONE, {"from": account, "value": CENT})
+    assert marketplace.getStats(NFT1)[2] == 5 * ONE / 10 + CENT
+
+
+def test_archive_listings(marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+    owner = get_account(index=8)
+
+    with brownie.reverts("MarketPlace: Only the owner can do that"):
+        marketplace.setArchiveListings(True, {"from": account})
+    marketplace.setArchiveListings(True, {"from": owner})
+    assert marketplace.archiveListings() == True
+
+    NFT1.setApprovalForAll(marketplace, True)
+    for i in range(4):
+        marketplace.sell(NFT1.address, i, ONE, {"from": account})
+    # prices and tokenIds that don't fit in the packed listing are cleared too
+    marketplace.sell(NFT1.address, 4, 2 ** 200, {"from": account})
+
+    # SOLD and CANCELED listings are cleared and read as DOESNT EXIST
+    tx = marketplace.buy(0, {"from": acc1, "value": ONE})
+    assert tx.events["Sale"]["_id"] == 0
+    marketplace.cancelSell(1, {"from": account})
+    marketplace.cancelSellBatch(_packed([4]), {"from": account})
+    marketplace.sell(NFT1.address, 2, ONE * 2, {"from": account})
+    for i in [0, 1, 2, 4]:
+        assert marketplace.idToListing(i) == (ZERO_ADDRESS, ZERO_ADDRESS, 0, 0, 0)
+    assert marketplace.idToListing(3) == (account, NFT1.address, 3, ONE, 1)
+    assert marketplace.idToListing(5) == (account, NFT1.address, 2, ONE * 2, 1)
+    assert marketplace.openListingCount() == 2
+
+    with brownie.reverts("MarketPlace: Listing doesn't exist"):
+        marketplace.buy(0, {"from": acc1, "value": ONE})
+    with brownie.reverts("MarketPlace: Only the seller can cancel"):
+        marketplace.cancelSell(1, {"from": account})
+
+    # listings are kept once the mode is turned off
+    marketplace.setArchiveListings(False, {"from": owner})
+    marketplace.buy(3, {"from": acc1, "value": ONE})
+    assert marketplace.idToListing(3) == (account, NFT1.address, 3, ONE, 2)
+
+
+def test_extension_reward(marketplace):
+    account = get_account()
+    acc1 = get_account(index=1)
+    owner = get_account(index=8)
+    marketCoin = Contract.from_abi(
+        MarketCoin._name, marketplace.marketCoin(), MarketCoin.abi
+    )
+
+    with brownie.reverts("MarketPlace: Only an extension can reward"):
+        marketplace.rewardMarketCoin(acc1, ONE, {"from": account})
+    with brownie.reverts("MarketPlace: Only the owner can do that"):
+        marketplace.setExtension(account, True, {"from": account})
+
+    marketplace.setExtension(account, True, {"from": owner})
+    assert marketplace.extensions(account) == True
+    marketplace.rewardMarketCoin(acc1, ONE, {"from": account})
+    assert marketCoin.balanceOf(acc1) == ONE
+
+    marketplace.setExtension(account, False, {"from": owner})
+    with brownie.reverts("MarketPlace: Only an extension can reward"):
+        marketplace.rewardMarketCoin(acc1, ONE, {"from": account})
+
+
+def test_DOMAIN_SEPARATOR(marketplace):
+    expected = keccak(
+        keccak(b"EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)")
+        + keccak(b"NFTMarketPlace")
+        + keccak(b"1")
+        + _word(chain.id)
+        + _word(marketplace.address)
+    )
+    assert marketplace.DOMAIN_SEPARATOR() == "0x" + expected.hex()
+
+
+def test_fulfillOrder(marketplace, NFT1, signer):
+    acc1 = get_account(index=1)
+    init_balance_signer = signer.balance()
+    init_balance_acc1 = acc1.balance()
+    init_currentId = marketplace.currentId()
+
+    # the ether sent above the price is refunded
+    v, r, s = sign_order(marketplace, signer, NFT1, 30, ONE, EXPIRY, 0)
+    tx = marketplace.fulfillOrder(signer, NFT1, 30, ONE, EXPIRY, 0, v, r, s, {"from": acc1, "value": ONE + POINT_ONE})
+
+    assert NFT1.ownerOf(30) == acc1
+    assert signer.balance() == init_balance_signer + ONE
+    assert acc1.balance() == init_balance_acc1 - ONE
+    # nothing is listed on-chain
+    assert marketplace.currentId() == init_currentId
+
+    marketCoin = Contract.from_abi(MarketCoin._name, marketplace.marketCoin(), MarketCoin.abi)
+    assert marketCoin.balanceOf(signer) == ONE / 10
+
+    # Test Event
+    assert len(tx.events["Sale"]) == 1
+    assert tx.events["Sale"][0]["_id"] == NO_LISTING
+    assert tx.events["Sale"][0]["_seller"] == signer
+    assert tx.events["Sale"][0]["_buyer"] == acc1
+    assert tx.events["Sale"][0]["_price"] == ONE
+    assert tx.events["Sale"][0]["_tokenId"] == 30
+
+
+def test_fulfillOrder_cancel_listing(marketplace, NFT1, signer):
+    acc1 = get_account(index=1)
+    id = marketplace.sell(NFT1, 31, 2 * ONE, {"from": signer}).return_value
+
+    # the OPEN listing of the token is cancelled when an order fills
+    v, r, s = sign_order(marketplace, signer, NFT1, 31, ONE, EXPIRY, 0)
+    marketplace.fulfillOrder(signer, NFT1, 31, ONE, EXPIRY, 0, v, r, s, {"from": acc1, "value": ONE})
+
+    assert marketplace.idToListing(id)[4] == 3
+    assert marketplace.openListingCount() == 0
+    with brownie.reverts("MarketPlace: No active listing"):
+        marketplace.activeListingOf(NFT1, 31)
+
+
+def test_fulfillOrder_revert(marketplace, NFT1, signer):
+    acc1 = get_account(index=1)
+    v, r, s = sign_order(marketplace, signer, NFT1, 30, ONE, EXPIRY, 0)
+
+    # fails because not enough ether sent
+    with brownie.reverts("MarketPlace: Not enough ether sent"):
+        marketplace.fulfillOrder(signer, NFT1, 30, ONE, EXPIRY, 0, v, r, s, {"from": acc1, "value": ONE - 1})
+    # fails because the price isn't the signed one
+    with brownie.reverts("MarketPlace: Invalid signature"):
+        marketplace.fulfillOrder(signer, NFT1, 30, ONE - 1, EXPIRY, 0, v, r, s, {"from": acc1, "value": ONE})
+    # fails because the order wasn't signed by acc1
+    with brownie.reverts("MarketPlace: Invalid signature"):
+        marketplace.fulfillOrder(acc1, NFT1, 30, ONE, EXPIRY, 0, v, r, s, {"from": acc1, "value": ONE})
+
+    marketplace.fulfillOrder(signer, NFT1, 30, ONE, EXPIRY, 0, v, r, s, {"from": acc1, "value": ONE})
+    # fails because an order can only be filled once
+    with brownie.reverts("MarketPlace: Order already filled"):
+        marketplace.fulfillOrder(signer, NFT1, 30, ONE, EXPIRY, 0, v, r, s, {"from": acc1, "value": ONE})
+
+    # fails because the order is expired
+    v, r, s = sign_order(marketplace, signer, NFT1, 31, ONE, 1, 0)
+    with brownie.reverts("MarketPlace: Order expired"):
+        marketplace.fulfillOrder(signer, NFT1, 31, ONE, 1, 0, v, r, s, {"from": acc1, "value": ONE})
+
+
+def test_cancelOrders(marketplace, NFT1, signer):
+    acc1 = get_account(index=1)
+    v, r, s = sign_order(marketplace, signer, NFT1, 30, ONE, EXPIRY, 0)
+
+    marketplace.cancelOrders({"from": signer})
+    assert marketplace.orderNonces(signer) == 1
+
+    # fails because the order was signed with the previous nonce
+    with brownie.reverts("MarketPlace: Order cancelled"):
+        marketplace.fulfillOrder(signer, NFT1, 30, ONE, EXPIRY, 0, v, r, s, {"from": acc1, "value": ONE})
+
+    # orders signed with the new nonce can be filled
+    v, r, s = sign_order(marketplace, signer, NFT1, 30, ONE, EXPIRY, 1)
+    marketplace.fulfillOrder(signer, NFT1, 30, ONE, EXPIRY, 1, v, r, s, {"from": acc1, "value": ONE})
+    assert NFT1.ownerOf(30) == acc1
+
+
 def test_mint_marketNFT(marketplace, NFT1):
     account = get_account()
     acc1 = get_account(index=1)
@@ -582,10 +1643,39 @@ def test_mint_marketNFT(marketplace, NFT1):
     assert marketCoin.balanceOf(account) == priceNFT / 10 == POINT_ONE
     assert marketCoin.balanceOf(account) >= MARKETNFT_MINT_PRICE
 
-    marketCoin.approve(marketplace, MARKETNFT_MINT_PRICE, {"from": account})
+    init_total_supply = marketCoin.totalSupply()
+
+    # no approve needed, the MarketCoin are burned by the marketplace
     marketplace.mintMarketNFT({"from": account})
 
     assert marketCoin.balanceOf(account) == init_balance_account - MARKETNFT_MINT_PRICE
+    assert marketCoin.totalSupply() == init_total_supply - MARKETNFT_MINT_PRICE
+
+
+def test_mint_marketNFT_quantity(marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+
+    # a sale big enough to pay for 3 MarketNFT
+    NFT1.setApprovalForAll(marketplace, True)
+    priceNFT = 3 * ONE
+    marketplace.sell(NFT1.address, 0, priceNFT, {"from": account, "value": 0})
+    marketplace.buy(0, {"from": acc1, "value": priceNFT})
+
+    marketCoin = Contract.from_abi(MarketCoin._name, marketplace.marketCoin(), MarketCoin.abi)
+    marketNFT = Contract.from_abi(MarketNFT._name, marketplace.marketNFT(), MarketNFT.abi)
+    init_balance_account = marketCoin.balanceOf(account)
+
+    tx = marketplace.mintMarketNFT(3, {"from": account})
+
+    assert marketCoin.balanceOf(account) == init_balance_account - 3 * MARKETNFT_MINT_PRICE
+    assert marketNFT.balanceOf(account) == 3
+    assert marketNFT.ownerOf(0) == marketNFT.ownerOf(1) == marketNFT.ownerOf(2) == account
+    assert len(tx.events["Transfer"]) == 1 + 3
+
+    # fails because only 3 MarketNFT were paid for
+    with brownie.reverts():
+        marketplace.mintMarketNFT(1, {"from": account})
 
 
 def test_mint_marketNFT_revert(marketplace, NFT1):
@@ -602,13 +1692,8 @@ def test_mint_marketNFT_revert(marketplace, NFT1):
     marketCoin_address = marketplace.marketCoin()
     marketCoin = Contract.from_abi(MarketCoin._name, marketCoin_address, MarketCoin.abi)
 
-    # fails because not enough MarketCoin approved
-    with brownie.reverts():
-        marketplace.mintMarketNFT({"from": account})
-
     # fails because not enough MarketCoin
     marketCoin.burn(1, {"from": account})
     assert marketCoin.balanceOf(account) < MARKETNFT_MINT_PRICE
-    marketCoin.approve(marketplace, MARKETNFT_MINT_PRICE, {"from": account})
     with brownie.reverts():
         marketplace.mintMarketNFT({"from": account})
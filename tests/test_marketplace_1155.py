@@ -0,0 +1,197 @@
+import pytest
+from scripts.helpful_scripts import get_account, ONE, POINT_ONE, CENT
+import brownie
+from brownie import Contract, MarketCoin, MarketNFT
+
+MARKETNFT_MINT_PRICE = POINT_ONE
+TOKEN_ID = 7
+
+
+@pytest.fixture
+def marketplace(NFTMarketPlace, MarketCoin):
+    owner = get_account(index=8)
+    marketcoin = MarketCoin.deploy(owner, {"from": owner})
+
+    marketplace = NFTMarketPlace.deploy({"from": owner})
+    marketnft = MarketNFT.deploy(marketplace, MARKETNFT_MINT_PRICE, {"from": owner})
+    marketplace.setMarketCoin(marketcoin, {"from": owner})
+    marketplace.setMarketNFT(marketnft, {"from": owner})
+    marketcoin.setOwner(marketplace, {"from": owner})
+    return marketplace
+
+
+@pytest.fixture
+def marketplace1155(NFTMarketPlace1155, marketplace):
+    owner = get_account(index=8)
+    marketplace1155 = NFTMarketPlace1155.deploy(marketplace, {"from": owner})
+    marketplace.setExtension(marketplace1155, True, {"from": owner})
+    return marketplace1155
+
+
+# Deploy a MultiToken and mint 100 units of TOKEN_ID to account
+@pytest.fixture
+def multitoken(MultiToken, marketplace1155):
+    account = get_account()
+    multitoken = MultiToken.deploy({"from": account})
+    multitoken.mint(TOKEN_ID, 100, {"from": account})
+    multitoken.setApprovalForAll(marketplace1155, True, {"from": account})
+    return multitoken
+
+
+def test_marketplace(marketplace1155, marketplace):
+    assert marketplace1155.marketplace() == marketplace
+    assert marketplace1155.owner() == get_account(index=8)
+
+
+def test_set_fee(marketplace1155):
+    owner = get_account(index=8)
+    marketplace1155.setPostingFee(CENT, {"from": owner})
+    marketplace1155.setSellingFee(2, {"from": owner})
+    assert marketplace1155.postingFee() == CENT
+    assert marketplace1155.sellingFee() == 2
+
+    with brownie.reverts("MarketPlace: Only the owner can do that"):
+        marketplace1155.setPostingFee(0, {"from": get_account()})
+    with brownie.reverts("MarketPlace: Only the owner can do that"):
+        marketplace1155.setSellingFee(0, {"from": get_account()})
+    # fails because the fee is more than 100%
+    with brownie.reverts("MarketPlace: Invalid fee"):
+        marketplace1155.setSellingFee(101, {"from": owner})
+    marketplace1155.setSellingFee(100, {"from": owner})
+
+
+def test_sell(marketplace1155, multitoken):
+    account = get_account()
+    tx = marketplace1155.sell(multitoken, TOKEN_ID, 50, POINT_ONE, {"from": account})
+    assert tx.return_value == 0
+    assert marketplace1155.currentId() == 1
+    assert marketplace1155.idToListing(0) == (
+        account,
+        multitoken.address,
+        TOKEN_ID,
+        POINT_ONE,
+        50,
+        1,
+    )
+    assert tx.events["Listed"].values() == [
+        0,
+        account,
+        multitoken.address,
+        TOKEN_ID,
+        50,
+        POINT_ONE,
+    ]
+
+
+def test_sell_revert(marketplace1155, multitoken):
+    account = get_account()
+    acc1 = get_account(index=1)
+    owner = get_account(index=8)
+    with brownie.reverts("MarketPlace: Quantity must be positive"):
+        marketplace1155.sell(multitoken, TOKEN_ID, 0, POINT_ONE, {"from": account})
+    with brownie.reverts("MarketPlace: Not enough units to sell"):
+        marketplace1155.sell(multitoken, TOKEN_ID, 101, POINT_ONE, {"from": account})
+
+    multitoken.mint(TOKEN_ID, 10, {"from": acc1})
+    with brownie.reverts(
+        "MarketPlace: The marketplace doesn't have authorization to sell this token for this user"
+    ):
+        marketplace1155.sell(multitoken, TOKEN_ID, 10, POINT_ONE, {"from": acc1})
+
+    marketplace1155.setPostingFee(CENT, {"from": owner})
+    with brownie.reverts("MarketPlace: Amount sent is below postingFee"):
+        marketplace1155.sell(multitoken, TOKEN_ID, 10, POINT_ONE, {"from": account})
+
+
+def test_buy(marketplace1155, marketplace, multitoken):
+    account = get_account()
+    acc1 = get_account(index=1)
+    acc2 = get_account(index=2)
+    marketCoin = Contract.from_abi(
+        MarketCoin._name, marketplace.marketCoin(), MarketCoin.abi
+    )
+    marketplace1155.sell(multitoken, TOKEN_ID, 50, POINT_ONE, {"from": account})
+
+    # Partial fill, only the quantity left changes
+    balance = account.balance()
+    tx = marketplace1155.buy(0, 10, {"from": acc1, "value": ONE})
+    assert tx.return_value == 40
+    assert marketplace1155.idToListing(0)[4:] == (40, 1)
+    assert account.balance() == balance + ONE
+    assert multitoken.balanceOf(account, TOKEN_ID) == 90
+    assert multitoken.balanceOf(acc1, TOKEN_ID) == 10
+    assert marketCoin.balanceOf(account) == ONE / 10
+    assert marketCoin.balanceOf(acc1) == ONE / 10
+    assert len(tx.events["TransferSingle"]) == 1
+    assert tx.events["Sale"].values() == [0, account, acc1, 10, ONE]
+
+    # Buying the units left closes the listing
+    tx = marketplace1155.buy(0, 40, {"from": acc2, "value": 4 * ONE})
+    assert tx.return_value == 0
+    assert marketplace1155.idToListing(0)[4:] == (0, 2)
+    assert multitoken.balanceOf(acc2, TOKEN_ID) == 40
+    assert tx.events["Sale"].values() == [0, account, acc2, 40, 4 * ONE]
+
+
+def test_buy_selling_fee(marketplace1155, multitoken):
+    account = get_account()
+    acc1 = get_account(index=1)
+    owner = get_account(index=8)
+    marketplace1155.setSellingFee(2, {"from": owner})
+    marketplace1155.sell(multitoken, TOKEN_ID, 50, POINT_ONE, {"from": account})
+
+    balance = account.balance()
+    marketplace1155.buy(0, 10, {"from": acc1, "value": ONE})
+    assert account.balance() == balance + ONE * 98 / 100
+    assert marketplace1155.balance() == ONE * 2 / 100
+
+    with brownie.reverts("MarketPlace: Only the owner can withdraw"):
+        marketplace1155.withdraw(ONE * 2 / 100, {"from": account})
+    marketplace1155.withdraw(ONE * 2 / 100, {"from": owner})
+    assert marketplace1155.balance() == 0
+
+
+def test_buy_revert(marketplace1155, marketplace, multitoken):
+    account = get_account()
+    acc1 = get_account(index=1)
+    owner = get_account(index=8)
+    with brownie.reverts("MarketPlace: Listing doesn't exist"):
+        marketplace1155.buy(0, 1, {"from": acc1, "value": POINT_ONE})
+
+    marketplace1155.sell(multitoken, TOKEN_ID, 50, POINT_ONE, {"from": account})
+    with brownie.reverts("MarketPlace: Not enough units for sale"):
+        marketplace1155.buy(0, 0, {"from": acc1})
+    with brownie.reverts("MarketPlace: Not enough units for sale"):
+        marketplace1155.buy(0, 51, {"from": acc1, "value": 6 * ONE})
+    with brownie.reverts("MarketPlace: Not enough ether sent"):
+        marketplace1155.buy(0, 10, {"from": acc1, "value": ONE - 1})
+
+    # fails if the marketplace1155 isn't an extension of the marketplace
+    marketplace.setExtension(marketplace1155, False, {"from": owner})
+    with brownie.reverts("MarketPlace: Only an extension can reward"):
+        marketplace1155.buy(0, 10, {"from": acc1, "value": ONE})
+    marketplace.setExtension(marketplace1155, True, {"from": owner})
+
+    marketplace1155.buy(0, 50, {"from": acc1, "value": 5 * ONE})
+    with brownie.reverts("MarketPlace: Token no longer for sale"):
+        marketplace1155.buy(0, 1, {"from": acc1, "value": POINT_ONE})
+
+
+def test_cancelSell(marketplace1155, multitoken):
+    account = get_account()
+    acc1 = get_account(index=1)
+    marketplace1155.sell(multitoken, TOKEN_ID, 50, POINT_ONE, {"from": account})
+    marketplace1155.buy(0, 10, {"from": acc1, "value": ONE})
+
+    with brownie.reverts("MarketPlace: Only the seller can cancel"):
+        marketplace1155.cancelSell(0, {"from": acc1})
+    tx = marketplace1155.cancelSell(0, {"from": account})
+    assert marketplace1155.idToListing(0)[5] == 3
+    assert tx.events["Cancelled"].values() == [0]
+
+    with brownie.reverts(
+        "MarketPlace: Token not for sale (already sold, cancel or doesn't exist)"
+    ):
+        marketplace1155.cancelSell(0, {"from": account})
+    with brownie.reverts("MarketPlace: Token no longer for sale"):
+        marketplace1155.buy(0, 1, {"from": acc1, "value": POINT_ONE})
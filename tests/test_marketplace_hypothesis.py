@@ -72,6 +72,7 @@ def test_sell(NFT1, marketplace, _value, _tokenId):
 
     # Test Event
     assert len(tx.events) == 1
+    assert tx.events[0]["_id"] == tx.return_value
     assert tx.events[0]["_seller"] == account
     assert tx.events[0]["_price"] == _value
     assert tx.events[0]["_nft"] == NFT1
@@ -110,29 +111,27 @@ def test_buy(NFT1, marketplace, _value, _tokenId, _buyer):
     assert NFT1.ownerOf(_tokenId) == _buyer
 
     # Test Event
-    assert len(tx.events) == 5
-    ## Transfer of NFT
-    assert tx.events[0]["_from"] == account
-    assert tx.events[0]["_to"] == _buyer
+    assert len(tx.events) == 4
+    ## Sale, before the external calls
+    assert tx.events[0].name == "Sale"
+    assert tx.events[0]["_id"] == id
+    assert tx.events[0]["_seller"] == account
+    assert tx.events[0]["_buyer"] == _buyer
+    assert tx.events[0]["_price"] == _value
+    assert tx.events[0]["_nft"] == NFT1
     assert tx.events[0]["_tokenId"] == _tokenId
 
-    ## Test Transfer Event - Mint MarketCoin to seller
-    assert tx.events[1]["_from"] == ZERO_ADDRESS
-    assert tx.events[1]["_to"] == account
-    assert tx.events[1]["_value"] == np.floor(Decimal(_value) / 10)
+    ## Transfer of NFT
+    assert tx.events[1]["_from"] == account
+    assert tx.events[1]["_to"] == _buyer
+    assert tx.events[1]["_tokenId"] == _tokenId
 
-    ## Test Transfer Event - Mint MarketCoin to buyer
+    ## Test Transfer Event - Mint MarketCoin to seller
     assert tx.events[2]["_from"] == ZERO_ADDRESS
-    assert tx.events[2]["_to"] == _buyer
+    assert tx.events[2]["_to"] == account
     assert tx.events[2]["_value"] == np.floor(Decimal(_value) / 10)
 
-    ## Update Listing
-    assert tx.events[3]["_id"] == id
-    assert tx.events[3]["_listing"][4] == 2
-
-    ## Sale
-    assert tx.events[4]["_seller"] == account
-    assert tx.events[4]["_buyer"] == _buyer
-    assert tx.events[4]["_price"] == _value
-    assert tx.events[4]["_nft"] == NFT1
-    assert tx.events[4]["_tokenId"] == _tokenId
+    ## Test Transfer Event - Mint MarketCoin to buyer
+    assert tx.events[3]["_from"] == ZERO_ADDRESS
+    assert tx.events[3]["_to"] == _buyer
+    assert tx.events[3]["_value"] == np.floor(Decimal(_value) / 10)
@@ -0,0 +1,161 @@
+import pytest
+import brownie
+from scripts.helpful_scripts import get_account, ONE, POINT_ONE, ZERO_ADDRESS
+from brownie import MarketNFT
+
+NAME = "NFT1"
+SYMBOL = "1"
+MINT_PRICE = POINT_ONE
+MARKETNFT_MINT_PRICE = POINT_ONE
+MAX_PAGE = 100
+MAX_VALIDITY_CHECK = 256
+
+
+@pytest.fixture
+def marketplace(NFTMarketPlace, MarketCoin):
+    owner = get_account(index=8)
+    marketcoin = MarketCoin.deploy(owner, {"from": owner})
+
+    marketplace = NFTMarketPlace.deploy({"from": owner})
+    marketnft = MarketNFT.deploy(marketplace, MARKETNFT_MINT_PRICE, {"from": owner})
+    marketplace.setMarketCoin(marketcoin, {"from": owner})
+    marketplace.setMarketNFT(marketnft, {"from": owner})
+    marketcoin.setOwner(marketplace, {"from": owner})
+    return marketplace
+
+
+@pytest.fixture
+def lens(NFTMarketPlaceLens, marketplace):
+    owner = get_account(index=8)
+    return NFTMarketPlaceLens.deploy(marketplace, {"from": owner})
+
+
+# Deploy an NFToken "1" and mint 10 token to account and list them
+@pytest.fixture
+def NFT1(NFToken, marketplace):
+    account = get_account()
+    nftoken = NFToken.deploy(NAME, SYMBOL, MINT_PRICE, {"from": account})
+    for i in range(10):
+        nftoken.mint({"value": MINT_PRICE, "from": account})
+    nftoken.setApprovalForAll(marketplace, True, {"from": account})
+    for i in range(10):
+        marketplace.sell(nftoken, i, ONE + i, {"from": account})
+    return nftoken
+
+
+def test_marketplace(lens, marketplace):
+    assert lens.marketplace() == marketplace
+
+
+def test_getListings(lens, marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+    marketplace.cancelSell(3, {"from": account})
+    marketplace.buy(5, {"from": acc1, "value": ONE + 5})
+
+    # OPEN listings
+    ids, listings, found, cursor = lens.getListings(0, MAX_PAGE, 1)
+    assert found == 8
+    assert cursor == 10
+    assert ids[:found] == (0, 1, 2, 4, 6, 7, 8, 9)
+    assert listings[0] == (account, NFT1.address, 0, ONE, 1)
+    assert listings[7] == (account, NFT1.address, 9, ONE + 9, 1)
+    assert listings[8] == (ZERO_ADDRESS, ZERO_ADDRESS, 0, 0, 0)
+
+    # SOLD and CANCELED listings
+    ids, listings, found, cursor = lens.getListings(0, MAX_PAGE, 2)
+    assert found == 1
+    assert ids[0] == 5
+    assert listings[0] == (account, NFT1.address, 5, ONE + 5, 2)
+    ids, listings, found, cursor = lens.getListings(0, MAX_PAGE, 3)
+    assert found == 1
+    assert ids[0] == 3
+
+
+def test_getListings_pagination(lens, NFT1):
+    # any status, 4 by 4
+    ids, listings, found, cursor = lens.getListings(0, 4, 0)
+    assert found == 4
+    assert ids[:found] == (0, 1, 2, 3)
+    assert cursor == 4
+
+    ids, listings, found, cursor = lens.getListings(cursor, 4, 0)
+    assert ids[:found] == (4, 5, 6, 7)
+
+    ids, listings, found, cursor = lens.getListings(cursor, 4, 0)
+    assert found == 2
+    assert ids[:found] == (8, 9)
+    assert cursor == 10
+
+    # nothing left
+    ids, listings, found, cursor = lens.getListings(cursor, 4, 0)
+    assert found == 0
+    assert cursor == 10
+
+    # the page size is capped
+    ids, listings, found, cursor = lens.getListings(0, MAX_PAGE + 1, 0)
+    assert found == 10
+
+
+def test_getNftOpenListings(lens, marketplace, NFT1):
+    account = get_account()
+    marketplace.cancelSell(0, {"from": account})
+
+    ids, listings, found = lens.getNftOpenListings(NFT1, 0, MAX_PAGE)
+    assert found == 9
+    assert ids[:found] == (9, 1, 2, 3, 4, 5, 6, 7, 8)
+    assert listings[0] == (account, NFT1.address, 9, ONE + 9, 1)
+
+    ids, listings, found = lens.getNftOpenListings(NFT1, 7, 4)
+    assert found == 2
+    assert ids[:found] == (7, 8)
+
+    ids, listings, found = lens.getNftOpenListings(ZERO_ADDRESS, 0, MAX_PAGE)
+    assert found == 0
+
+
+def test_getSellerListings(lens, marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+    marketplace.buy(2, {"from": acc1, "value": ONE + 2})
+
+    ids, listings, found = lens.getSellerListings(account, 0, 4)
+    assert found == 4
+    assert ids[:found] == (0, 1, 2, 3)
+    assert listings[2] == (account, NFT1.address, 2, ONE + 2, 2)
+
+    ids, listings, found = lens.getSellerListings(account, 8, MAX_PAGE)
+    assert ids[:found] == (8, 9)
+
+    ids, listings, found = lens.getSellerListings(acc1, 0, MAX_PAGE)
+    assert found == 0
+
+
+def test_areListingsValid(lens, marketplace, NFT1):
+    account = get_account()
+    acc1 = get_account(index=1)
+    marketplace.cancelSell(1, {"from": account})
+    NFT1.transferFrom(account, acc1, 2, {"from": account})
+
+    ids = [0, 1, 2, 3, 10] + [0] * (MAX_VALIDITY_CHECK - 5)
+    # only listings 0 and 3 can be bought, 10 doesn't exist
+    assert lens.areListingsValid(ids, 5) == 0b01001
+    assert lens.areListingsValid(ids, 0) == 0
+
+    # fails because too many listings
+    with brownie.reverts("MarketPlace: Batch too big"):
+        lens.areListingsValid(ids, MAX_VALIDITY_CHECK + 1)
+
+
+def test_areListingsValid_burned(lens, marketplace):
+    account = get_account()
+    marketNFT = MarketNFT.deploy(account, ONE, {"from": account})
+    marketNFT.mintBatch(account, 2, {"from": account})
+    marketNFT.setApprovalForAll(marketplace, True, {"from": account})
+    first = marketplace.currentId()
+    marketplace.sell(marketNFT, 0, ONE, {"from": account})
+    marketplace.sell(marketNFT, 1, ONE, {"from": account})
+    marketNFT.burn(0, {"from": account})
+
+    ids = [first, first + 1] + [0] * (MAX_VALIDITY_CHECK - 2)
+    assert lens.areListingsValid(ids, 2) == 0b10
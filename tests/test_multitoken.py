@@ -0,0 +1,55 @@
+import pytest
+from scripts.helpful_scripts import get_account, ZERO_ADDRESS
+import brownie
+
+
+@pytest.fixture
+def multitoken(MultiToken):
+    account = get_account()
+    multitoken = MultiToken.deploy({"from": account})
+    multitoken.mint(1, 100, {"from": account})
+    return multitoken
+
+
+def test_supportsInterface(multitoken):
+    assert multitoken.supportsInterface("0x01ffc9a7") == True
+    assert multitoken.supportsInterface("0xd9b67a26") == True
+    assert multitoken.supportsInterface("0x80ac58cd") == False
+
+
+def test_mint(multitoken):
+    account = get_account()
+    tx = multitoken.mint(1, 20, {"from": account})
+    assert multitoken.balanceOf(account, 1) == 120
+    assert tx.events["TransferSingle"].values() == [account, ZERO_ADDRESS, account, 1, 20]
+
+
+def test_safeTransferFrom(multitoken):
+    account = get_account()
+    acc1 = get_account(index=1)
+    tx = multitoken.safeTransferFrom(account, acc1, 1, 30, b"", {"from": account})
+    assert multitoken.balanceOf(account, 1) == 70
+    assert multitoken.balanceOf(acc1, 1) == 30
+    assert tx.events["TransferSingle"].values() == [account, account, acc1, 1, 30]
+
+
+def test_safeTransferFrom_operator(multitoken):
+    account = get_account()
+    acc1 = get_account(index=1)
+    acc2 = get_account(index=2)
+    with brownie.reverts("Caller not approved"):
+        multitoken.safeTransferFrom(account, acc2, 1, 30, b"", {"from": acc1})
+
+    multitoken.setApprovalForAll(acc1, True, {"from": account})
+    assert multitoken.isApprovedForAll(account, acc1) == True
+    multitoken.safeTransferFrom(account, acc2, 1, 30, b"", {"from": acc1})
+    assert multitoken.balanceOf(acc2, 1) == 30
+
+
+def test_safeTransferFrom_revert(multitoken):
+    account = get_account()
+    acc1 = get_account(index=1)
+    with brownie.reverts("Can't transfer to null address"):
+        multitoken.safeTransferFrom(account, ZERO_ADDRESS, 1, 30, b"", {"from": account})
+    with brownie.reverts():
+        multitoken.safeTransferFrom(account, acc1, 1, 101, b"", {"from": account})
@@ -125,6 +125,10 @@ def test_transferFrom(nftoken_contract):
     assert nftoken_contract.ownerOf(0) == account
     assert nftoken_contract.ownerOf(1) == acc2
     assert nftoken_contract.ownerOf(2) == acc2
+    assert nftoken_contract.balanceOf(account) == 1
+    assert nftoken_contract.balanceOf(acc1) == 0
+    assert nftoken_contract.balanceOf(acc2) == 2
+    assert nftoken_contract.totalSupply() == 3
 
     # Test Event
     assert len(tx.events) == 1
@@ -233,3 +237,13 @@ def test_setApprovedForAll(nftoken_contract):
     assert tx.events[0]["_owner"] == account
     assert tx.events[0]["_operator"] == acc1
     assert tx.events[0]["_approved"] == False
+
+
+def test_transferFrom_revert_if_token_doesnt_exist(nftoken_contract):
+    account = get_account()
+    acc1 = get_account(index=1)
+    nftoken_contract.mint({"value": ONE})
+
+    # fails because token 1 has no owner
+    with brownie.reverts():
+        nftoken_contract.transferFrom(ZERO_ADDRESS, acc1, 1, {"from": account})